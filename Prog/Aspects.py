@@ -12,8 +12,6 @@ __docformat__ = "restructuredtext"
 
 import six
 
-import inspect
-import linecache
 import sys
 
 NOVALUE = type("NOVALUE", (object,), {})
@@ -192,8 +190,7 @@ def decorMethods(klass, regExpOrPredicate, wrapper):
 def _getCallerDict(callerDict=None, depth=2):
     """This is IT!!!!"""
     if callerDict is None:
-        linecache.checkcache()
-        frame = inspect.stack()[depth][0]
+        frame = sys._getframe(depth)
         try:
             return frame.f_globals
         finally:
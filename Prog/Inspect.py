@@ -7,6 +7,10 @@ module.
 __docformat__ = "restructuredtext"
 
 import inspect
+import os
+import traceback
+
+from cleversheep3.Prog import Files
 
 
 def callerFrame(depth=1):
@@ -59,14 +63,10 @@ def dumpStack(level=1):
     The result is a lie, but normally more readily useful. It is only intended
     to be used for debugging.
     """
-    import traceback
-    from io import StringIO
-
     cwd = os.path.dirname(os.path.dirname(__file__))
     stack = traceback.extract_stack()
     data = []
     maxLen = 0
-    f = StringIO()
     for filename, lineNumber, functionName, text in stack[:-level]:
         if "/cleversheep3/" in filename:
             continue
@@ -77,7 +77,7 @@ def dumpStack(level=1):
         data.append((location, text))
         maxLen = max(len(location), maxLen)
 
-    f.write("Stack dump:\n")
-    for location, text in data:
-        f.write("    %-*s - %s\n" % (maxLen, location, text))
-    print(f.getvalue())
+    parts = ["Stack dump:\n"]
+    parts.extend("    %-*s - %s\n" % (maxLen, location, text)
+                 for location, text in data)
+    print("".join(parts))
@@ -4,26 +4,32 @@ TODO:
 
 """
 
+import importlib
 import sys
 
+
 class Proxy:
+    """A stand-in for a module that is imported on first attribute access.
+
+    Once the real module has been imported it replaces the proxy in
+    ``sys.modules`` and is cached, so later accesses go straight to it.
+
+    """
+    __slots__ = ("_name", "_mod")
+
     def __init__(self, name):
         object.__setattr__(self, "_name", name)
-        object.__setattr__(self, "__getattribute__", Proxy._getattribute__)
+        object.__setattr__(self, "_mod", None)
 
     def __getattr__(self, name):
-        return getattr(self._mod, name)
-
-    def _getattribute__(self, name):
-        print("PROXY ACTIVE")
-        modName = object.__getattribute__(self, "_name")
-        del sys.modules[modName]
-        d = {}
-        code = "import %s" % modName
-        exec(code, d, d)
-        sys.modules[modName] = m
-        del self.__getattribute__
-        self._mod, m = d[modName]
+        m = object.__getattribute__(self, "_mod")
+        if m is None:
+            modName = object.__getattribute__(self, "_name")
+            if sys.modules.get(modName) is self:
+                del sys.modules[modName]
+            m = importlib.import_module(modName)
+            sys.modules[modName] = m
+            object.__setattr__(self, "_mod", m)
         return getattr(m, name)
 
 
@@ -32,13 +38,4 @@ def lazy(name):
         return sys.modules[name]
     proxy = Proxy(name)
     sys.modules[name] = proxy
-
-
-
-lazy("zlib")
-import zlib
-
-print(zlib)
-print(dir(zlib))
-
-print(zlib.compress)
+    return proxy
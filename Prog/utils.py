@@ -4,18 +4,27 @@ import sys
 import os
 
 
+#: The loaded ``.cs-meta`` files, keyed by absolute path. A project's meta
+#: file is read at most once, however many projects depend on it.
+_metaCache = {}
+
+
 def loadCSMeta(dirPath='.'):
-    meta = {
-        'requires': (),
-    }
     metaPath = os.path.join(dirPath, '.cs-meta')
-    if os.path.exists(metaPath):
-        d = {}
-        with open(metaPath) as f:
-            code = compile(f.read(), metaPath, 'exec')
-            exec(code, d, )
-        meta.update(d)
-    return meta
+    key = os.path.abspath(metaPath)
+    meta = _metaCache.get(key)
+    if meta is None:
+        meta = {
+            'requires': (),
+        }
+        if os.path.exists(metaPath):
+            d = {}
+            with open(metaPath) as f:
+                code = compile(f.read(), metaPath, 'exec')
+                exec(code, d, )
+            meta.update(d)
+        _metaCache[key] = meta
+    return dict(meta)
 
 
 def addThisProjectSourceToSysPath():
@@ -49,7 +58,12 @@ def addProjectSourceToSysPath(projectName):
 
 
 def addDependenciesToSysPath(dirPath='.'):
-    loaded = set()
+    _addDependencies(dirPath, set())
+
+
+def _addDependencies(dirPath, loaded):
+    # The set of loaded projects is shared by the whole walk, so each
+    # project's dependencies are only added once.
     meta = loadCSMeta(dirPath)
     loaded.add(os.path.abspath(dirPath))
     for required in meta['requires']:
@@ -57,4 +71,4 @@ def addDependenciesToSysPath(dirPath='.'):
         projDir = _getProjectDir(required)
         if projDir not in loaded:
             loaded.add(projDir)
-            addDependenciesToSysPath(projDir)
+            _addDependencies(projDir, loaded)
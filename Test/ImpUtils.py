@@ -11,7 +11,6 @@ import os
 import os.path
 import sys
 import imp
-import inspect
 
 
 def _findImported(path):
@@ -41,8 +40,8 @@ def _makeModName(modPath):
 def _getCallerDict(callerDict):
     """IMP Utils version"""
     if callerDict is None:
+        frame = sys._getframe(2)
         try:
-            frame = inspect.stack()[2][0]
             return frame.f_globals
         finally:
             del frame
@@ -236,9 +235,8 @@ def importAbove(pyFileName, star=False, mode="", cwd=False, startAbove=False):
         search.
 
     """
-    import inspect
+    frame = sys._getframe(1)
     try:
-        frame = inspect.stack()[1][0]
         callerDict = frame.f_globals
     finally:
         del frame
@@ -5,11 +5,13 @@ from __future__ import print_function
 __docformat__ = "restructuredtext"
 
 import builtins
-import glob
-import imp
+import functools
+import importlib.machinery
+import importlib.util
 import inspect
 import os
 import sys
+import weakref
 
 from cleversheep3.Extras.decorator import decorator
 from cleversheep3.Prog import Files
@@ -38,12 +40,36 @@ _import = None
 _loading = None
 _curScriptPackage = None
 
+#: Directories that are never searched for tests.
+_exclDirs = frozenset((".git", ".svn", "CVS"))
+
+
+#: A memoised ``os.path.normpath``, used by `cwdNormPath`.
+_normpath = functools.lru_cache(maxsize=4096)(os.path.normpath)
+
+
+def cwdNormPath(path):
+    """Join a path to the current directory and normalise it.
+
+    This is only a join plus a memoised ``os.path.normpath``. The result is
+    the same as ``os.path.abspath``, but the current directory is read on
+    every call and symbolic links are not resolved. Only the normalisation is
+    memoised, because the current directory changes as the tree is searched.
+
+    :Parameters:
+      path
+        The path to convert. An absolute path is only normalised.
+
+    """
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    return _normpath(path)
+
 
 def _isTest(name, obj):
-    debug = lambda *a: None
-    if name == 'x':
-        debug = print
-    debug(f'{name=} {obj=}')
+    # Most namespace entries are quickly rejected by these cheap checks.
+    if name.startswith("__") or not callable(obj):
+        return False
     try:
         info = getattr(obj, "cs_test_info", None)
     except:
@@ -51,9 +77,6 @@ def _isTest(name, obj):
         # way that breaks here.
         return False
 
-    if not hasattr(obj, "__call__"):
-        return False
-
     if info is None:
         if name.startswith("test_"):
             info = Core.TestInfo()
@@ -73,17 +96,16 @@ def _isTest(name, obj):
             return False
 
     try:
-        info.cs_tags["cs_modPath"] = os.path.abspath(
+        info.cs_tags["cs_modPath"] = cwdNormPath(
                 obj.__globals__["__file__"])
     except AttributeError:
         # The function may be a callable class instance.
-        info.cs_tags["cs_modPath"] = os.path.abspath(
+        info.cs_tags["cs_modPath"] = cwdNormPath(
                 obj.__call__.__globals__["__file__"])
 
     # if getattr(obj.__self__.__class__.cs_attrs, 'inherit_tests', False):
     #     return True
     return True
-    return info.reserved_cs_flags['defined_in_base'] is obj.__class__
 
 
 def formatImportFailure(name, exc):
@@ -105,6 +127,20 @@ def formatImportFailure(name, exc):
     return "\n".join(s)
 
 
+def _isSubModule(parent, name, subName):
+    """Check whether a module, within a script's package, might be importable.
+
+    This allows `hookedImport` to avoid attempting (and failing) an import in
+    the common case. Only simple names are checked, using the package's path;
+    for anything else the import must simply be tried.
+
+    """
+    path = getattr(parent, "__path__", None)
+    if subName in sys.modules or path is None or not name or "." in name:
+        return True
+    return importlib.machinery.PathFinder.find_spec(subName, path) is not None
+
+
 def hookedImport(name,  globals=None, locals=None, fromlist=None, *args, **kwargs):
     _hooked.append(name)
     context = Context.getContext()
@@ -113,13 +149,14 @@ def hookedImport(name,  globals=None, locals=None, fromlist=None, *args, **kwarg
     try:
         if parent is not None:
             subName = "%s.%s" % (parent.__name__, name)
-            try:
-                mod = _import(subName, globals, locals, fromlist, *args,
-                        **kwargs)
-                submod = getattr(mod, name, None)
-                mod = sys.modules[subName]
-            except Exception as exc:
-                pass
+            if _isSubModule(parent, name, subName):
+                try:
+                    mod = _import(subName, globals, locals, fromlist, *args,
+                            **kwargs)
+                    submod = getattr(mod, name, None)
+                    mod = sys.modules[subName]
+                except Exception as exc:
+                    pass
 
         if mod is None:
             try:
@@ -146,6 +183,39 @@ def wrapImport(func, *args, **kwargs):
         builtins.__import__, _import = _import, None
 
 
+def _loadSource(modName, path):
+    """Load and execute a Python source file as a module.
+
+    This is a replacement for the deprecated ``imp.load_source``. If a module
+    called `modName` is already loaded then it is re-executed using the source
+    file.
+
+    The loader is given `path` as is, so that the code is compiled using the
+    same (possibly relative) file name as ``imp.load_source`` would.
+
+    """
+    loader = importlib.machinery.SourceFileLoader(modName, path)
+    spec = importlib.util.spec_from_file_location(modName, path,
+                                                  loader=loader)
+    mod = sys.modules.get(modName)
+    if mod is not None:
+        mod.__spec__ = spec
+        mod.__loader__ = spec.loader
+        mod.__file__ = spec.origin
+        mod.__cached__ = spec.cached
+        spec.loader.exec_module(mod)
+        return mod
+
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[modName] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        sys.modules.pop(modName, None)
+        raise
+    return sys.modules[modName]
+
+
 def loadModule(path, doReload=False):
     """Load a test script as a module.
 
@@ -167,10 +237,12 @@ def loadModule(path, doReload=False):
     if not doReload and path in _loadedModules:
         return _loadedModules[path]
 
-    ns = {}
+    # The module is normally in the current directory already, in which case
+    # there is no need to change directory.
     here = os.getcwd()
     subDir = os.path.dirname(path)
-    if subDir:
+    moved = subDir and subDir != here
+    if moved:
         os.chdir(subDir)
 
     global _loading, _curScriptPackage
@@ -179,7 +251,7 @@ def loadModule(path, doReload=False):
             try:
                 _loading = os.path.basename(path)
                 _curScriptPackage = parentMod
-                mod = imp.load_source(modName, os.path.basename(path))
+                mod = _loadSource(modName, os.path.basename(path))
             except Unsupported as exc:
                 return
             except Exception as exc:
@@ -189,7 +261,8 @@ def loadModule(path, doReload=False):
         except Unsupported:
             return
     finally:
-        os.chdir(here)
+        if moved:
+            os.chdir(here)
     return mod
 
 
@@ -204,11 +277,12 @@ class Collection:
 
     """
     def __init__(self):
-        self._tests = []
         self._dict = {}
         self._suites = {}
         self._testIDs = {}
         self._problems = {}
+        self._ancestorCache = {}
+        self._childIndex = None
         self._pruned = False
         self.spec = testspec.TestSpecDB()
 
@@ -217,7 +291,7 @@ class Collection:
             suite.reset()
 
     def clearAllTestMarks(self, mark):
-        for test in self._tests:
+        for test in self._dict.values():
             test.clearMark(mark)
 
     def clearAllSuiteMarks(self, mark):
@@ -229,60 +303,111 @@ class Collection:
         selc.clearAllSuiteMarks()
 
     def getItemByUid(self, uid):
-        if uid in self._suites:
-            return self._suites[uid]
-        for test in self._tests:
-            if test.uid == uid:
-                return test
+        suite = self._suites.get(uid)
+        if suite is not None:
+            return suite
+        return self._dict.get(uid)
 
     def addProblem(self, uid, exc):
         self._problems[uid] = exc
 
     def addSuite(self, uid, suite):
         self._suites[uid] = suite
+        self._ancestorCache.clear()
+        self._childIndex = None
         suite.setCollection(self)
         self._pruned = False
 
     def addTest(self, test):
-        self._tests.append(test)
         self._dict[test.uid] = test
+        self._childIndex = None
         test.setCollection(self)
-        assert len(self._tests) == len(self._dict)
         if test.testID:
-            if test.testID in self._testIDs:
+            if self._testIDs.setdefault(test.testID, test) is not test:
                 sys.stderr.write("Warning: Duplicate testID %r\n"
                         % test.testID)
-            self._testIDs[test.testID] = test
         self._pruned = False
         self.spec.gatherTestSteps(test.func)
 
     def numberTests(self):
         """Give each test a number."""
-        for i, test in enumerate(self._tests):
+        for i, test in enumerate(self._dict.values()):
             test.number = i + 1
             test.info.cs_test_num = test.number
 
     def parent(self, item):
         return self._suites.get(item.parentUid)
 
-    def getAncestors(self, item, oldestFirst=False):
-        if not item:
-            return []
-        parent, ancestors = item.parentUid, []
+    def _getAncestorChain(self, parentUid):
+        """Get the chain of suites starting with the one for `parentUid`.
+
+        :Return:
+            A tuple of suites, the one identified by `parentUid` first, then
+            its parent and so on. The chains are cached (until a suite is
+            added) and chains that end with an already known chain are built
+            from it.
+
+        """
+        chain = self._ancestorCache.get(parentUid)
+        if chain is not None:
+            return chain
+
+        parent, ancestors = parentUid, []
         while parent:
+            known = self._ancestorCache.get(parent)
+            if known is not None:
+                ancestors.extend(known)
+                break
             suite = self._suites.get(parent, None)
             ancestors.append(suite)
             if suite:
                 parent = suite.parentUid
-        if not oldestFirst:
-            ancestors.reverse()
-        return ancestors
+        chain = self._ancestorCache[parentUid] = tuple(ancestors)
+        return chain
+
+    def _chainFor(self, item):
+        if not item:
+            return ()
+        return self._getAncestorChain(item.parentUid)
+
+    def getAncestors(self, item, oldestFirst=False):
+        chain = self._chainFor(item)
+        if oldestFirst:
+            return list(chain)
+        return list(reversed(chain))
 
     def getLevel(self, test):
-        return len(self.getAncestors(test))
+        return len(self._chainFor(test))
+
+    def getChildren(self, suite):
+        """Get the direct children of a suite.
+
+        The children of every suite are indexed in a single pass over the
+        collection, the first time any suite's children are needed after a
+        suite or test has been added.
+
+        :Return:
+            A tuple of ``(suites, tests)``. Each is a list, in the order that
+            the items were added to the collection. These lists must not be
+            modified.
+
+        """
+        index = self._childIndex
+        if index is None:
+            index = self._childIndex = {}
+            suites = self._suites
+            for child in suites.values():
+                parent = suites.get(child.parentUid)
+                if parent is not None:
+                    index.setdefault(parent, ([], []))[0].append(child)
+            for child in self._dict.values():
+                parent = suites.get(child.parentUid)
+                if parent is not None:
+                    index.setdefault(parent, ([], []))[1].append(child)
+        return index.get(suite, ([], []))
 
     def __iter__(self):
-        return iter(self._tests)
+        return iter(self._dict.values())
 
     def prune(self):
         if self._pruned:
@@ -310,12 +435,12 @@ class Collection:
         return self._problems.items()
 
     def hasFailures(self):
-        for t in self._tests:
+        for t in self._dict.values():
             if t.hasRunProblem:
                 return True
 
     def select(self, select):
-        for test in self._tests:
+        for test in self._dict.values():
             select.matches(test)
 
     def diffAncestors(self, test, otherTest):
@@ -333,17 +458,18 @@ class Collection:
             The root suite for all tests has a ``level`` of zero.
 
         """
-        ancestors = self.getAncestors(test)
-        otherAncestors = self.getAncestors(otherTest)
-        ret = list(enumerate(ancestors))
-        while ancestors and otherAncestors:
-            if otherAncestors.pop(0) is not ancestors.pop(0):
-                break
-            ret.pop(0)
-        return ret
+        # The cached chains are parent first, so compare from their ends.
+        chain = self._chainFor(test)
+        otherChain = self._chainFor(otherTest)
+        last, otherLast = len(chain) - 1, len(otherChain) - 1
+        n = min(len(chain), len(otherChain))
+        i = 0
+        while i < n and chain[last - i] is otherChain[otherLast - i]:
+            i += 1
+        return [(level, chain[last - level]) for level in range(i, last + 1)]
 
     def __len__(self):
-        return len(self._tests)
+        return len(self._dict)
 
 
 def doCollect(collector, namespace, context, doReload=False, ignoreFiles=[]):
@@ -373,11 +499,11 @@ def doCollect(collector, namespace, context, doReload=False, ignoreFiles=[]):
 
 def _getFile(namespace, abs=True):
     if abs:
-        path = os.path.abspath(namespace["__file__"])
+        path = cwdNormPath(namespace["__file__"])
     else:
         path = namespace["__file__"]
-    if path.endswith(".pyo") or path.endswith(".pyc"):
-        path = path[:-1]
+    if path.endswith((".pyo", ".pyc")):
+        return path[:-1]
     return path
 
 
@@ -450,7 +576,10 @@ def collectFromNamespace(collection, instance, info, parent):
                     "Suite %r in file %s does not have a docstring" % (
                         name, Files.relName(path, cwd=Tester.execDir))))
             #assert 0
-        instNamespace = dict((n, getattr(inst, n)) for n in dir(value))
+        names = _dirCache.get(value)
+        if names is None:
+            names = _dirCache[value] = tuple(dir(value))
+        instNamespace = {n: getattr(inst, n) for n in names}
         instNamespace.update(inst.__dict__)
         parentSuite = collection.getItemByUid(parent)
         suite = Core.ClassSuite(inst, uid, parent, context,
@@ -466,17 +595,35 @@ def collectFromNamespace(collection, instance, info, parent):
     return collection
 
 
+def _moduleNamespace(mod):
+    """Get a copy of a test module's namespace, in name order.
+
+    This gives the same result as using ``dir`` and ``getattr``, because a
+    module's attributes are just the contents of its ``__dict__``.
+
+    """
+    return dict(sorted(vars(mod).items()))
+
+
+#: The attribute names of suite classes, as returned by ``dir``. The classes
+#: are weakly held, so classes from modules that have been reloaded can still
+#: be freed.
+_dirCache = weakref.WeakKeyDictionary()
+
+
 def _getSuiteKey(v):
     name, suite = v
-    if hasattr(suite, "_cs_suite_seq_"):
-        return 0, suite._cs_suite_seq_
+    seq = getattr(suite, "_cs_suite_seq_", None)
+    if seq is not None:
+        return 0, seq
     return 1, name
 
 
 def _getTestKey(v):
     name, func = v
-    if hasattr(func, "cs_test_info"):
-        return 0, func.cs_test_info._test_seq
+    info = getattr(func, "cs_test_info", None)
+    if info is not None:
+        return 0, info._test_seq
     return 1, name
 
 
@@ -485,9 +632,32 @@ class Hints:
         self.klass = klass.__name__
 
 
+#: The source files of test functions, as found by `_getSource`.
+_sourceCache = {}
+
+
+def _getSource(obj, hints=None):
+    """Find the source file for a test function, method or suite.
+
+    The result for functions and methods is cached, keyed by the function,
+    because inherited tests are visited for every derived suite.
+
+    """
+    if inspect.ismethod(obj):
+        key = obj.__func__
+    elif inspect.isfunction(obj):
+        key = obj
+    else:
+        return _findSource(obj, hints)
+    src = _sourceCache.get(key)
+    if src is None:
+        src = _sourceCache[key] = _findSource(obj, hints)
+    return src
+
+
 # TODO: Both testspec.py and Collection.py use inspect for source code.
 #       Would be nice to avoid doing the same thing twice.
-def _getSource(obj, hints=None):
+def _findSource(obj, hints=None):
     source =  klass = name = None
 
     # Use any available hints in preference.
@@ -538,7 +708,7 @@ def _getSource(obj, hints=None):
 def getSig(obj, hints=None):
     source = klass = name = None
     source = _getSource(obj, hints)
-    sourceDir = os.path.dirname(os.path.abspath(source))
+    sourceDir = os.path.dirname(cwdNormPath(source))
 
     # Use any available hints in preference.
     if hints:
@@ -584,9 +754,21 @@ class Provider(Coordinator.Provider):
         topNamespace = namespace
         path = _getFile(topNamespace)
         directory = os.path.dirname(path)
-        scripts = sorted(glob.glob(os.path.join(directory, "test_*.py")))
-        scripts = [s for s in scripts
-                if os.path.basename(s) not in ignoreFiles]
+        # A single directory scan provides both the test scripts and the
+        # sub-directories that might contain more tests.
+        ignored = frozenset(ignoreFiles)
+        exclDirs = _exclDirs.union(topNamespace.get("_exclDirs_", ()))
+        scripts, subdirs = [], []
+        with os.scandir(directory) as it:
+            for entry in it:
+                name = entry.name
+                if (name.startswith("test_") and name.endswith(".py")
+                        and name not in ignored and entry.is_file()):
+                    scripts.append(entry.path)
+                elif name not in exclDirs and entry.is_dir():
+                    subdirs.append(name)
+        scripts.sort()
+        subdirs.sort()
         names = [Files.relName(n, cwd=directory) for n in scripts]
 
         # Discover the tests in each test module.
@@ -596,7 +778,7 @@ class Provider(Coordinator.Provider):
             mod = loadModule(script, doReload)
             if mod is None:
                 continue
-            namespace = dict((n, getattr(mod, n)) for n in dir(mod))
+            namespace = _moduleNamespace(mod)
             uid = os.path.split(script), None, None
             instance = Core.ModuleSuite(script, uid, parent, context,
                                         namespace=namespace, myDir=os.getcwd())
@@ -615,15 +797,8 @@ class Provider(Coordinator.Provider):
             del instance._data_
 
         # Now recursively find any ``all_tests.py`` scripts in sub-directories.
-        exclDirs = topNamespace.get("_exclDirs_", [])
-        exclDirs.extend([".git", ".svn", "CVS"])
-
-        subdirs = sorted([p for p in os.listdir(directory)
-            if os.path.isdir(p)])
         modules = []
         for subdir in subdirs:
-            if subdir in exclDirs:
-                continue
             subPath = os.path.join(directory, subdir)
             allPath = os.path.join(subPath, "all_tests.py")
             if os.path.exists(allPath):
@@ -633,12 +808,12 @@ class Provider(Coordinator.Provider):
                 try:
                     context = Context.getContext(filePath=allPath)
                     mod = loadModule(allPath, doReload)
-                    namespace = dict((n, getattr(mod, n)) for n in dir(mod))
+                    namespace = _moduleNamespace(mod)
                     uid = os.path.split(allPath), None, None
                     instance = Core.ModuleSuite(allPath, uid, parent, context,
                                                 namespace=namespace,
                                                 myDir=modDir)
-                    instance._data_ = (mod, namespace, uid, os.getcwd())
+                    instance._data_ = (mod, namespace, uid, modDir)
                     modules.append(instance)
                 finally:
                     os.chdir(here)
@@ -674,7 +849,7 @@ def loadFixup():
         if fixup is not None:
             here = os.getcwd()
             try:
-                os.chdir(ImpUtils.findRoot("_fixup_.py"))
+                os.chdir(fixup)
                 with open('_fixup_.py') as f:
                     code = compile(f.read(), '_fixup_.py', 'exec')
                     exec(code)
@@ -683,24 +858,21 @@ def loadFixup():
 
 
 def _orderModules(modules):
-    class Node:
-        def __init__(self, m, p):
-            self.m = m
-            self.p = p
-            self.children = []
-
-    # Create a set of nodes, all children of a root node.
-    root = Node(None, None)
-    k = {}
+    """Order modules so that each one comes after those it must run after.
+
+    Modules that no other module needs to run after are taken in path
+    order. Each is preceded by a depth first, path ordered, walk of the
+    modules it must run after.
+
+    """
+    nodes = {}
     for m in modules:
-        pf = m.item
-        k[pf] = Node(m, m.item)
-        root.children.append(k[pf])
+        nodes[m.item] = m
 
-    # Reorganise into a DAG.
+    # Map each module to those it must run after.
+    deps, isDep = {}, set()
     for m in modules:
-        pf = m.item
-        n = k[pf]
+        after = deps[m.item] = []
         for pp in m.runAfter:
             if m.uid[0][-1] == "all_tests.py":
                 ppp = os.path.abspath(os.path.join(
@@ -708,31 +880,28 @@ def _orderModules(modules):
                             "all_tests.py"))
             else:
                 ppp = os.path.abspath(os.path.join(os.path.dirname(m.item), pp))
-            child = k.get(ppp, None)
-            if child is None:
-                continue
-            try:
-                root.children.remove(child)
-            except ValueError:
-                pass
-            n.children.append(child)
-
-    ordered = []
-    def _walk(t, seen, lev=0):
-        if not t.children and t.p not in seen:
-            if t is not root:
-                ordered.append(t.m)
-            seen[t.p] = None
-
-        for child in sorted(t.children, key=lambda n:n.p):
-            if child in seen:
-                continue
-            _walk(child, seen, lev+1)
-            if child.p not in seen:
-                seen[child.p] = None
-                ordered.append(child.m)
-
-    _walk(root, {})
+            if ppp in nodes:
+                after.append(ppp)
+                isDep.add(ppp)
+
+    # Walk the graph without recursion, emitting each module once all of
+    # those it must run after have been emitted.
+    ordered, done = [], set()
+    for root in sorted(p for p in nodes if p not in isDep):
+        stack, active = [(root, iter(sorted(deps[root])))], {root}
+        while stack:
+            p, it = stack[-1]
+            for dep in it:
+                if dep not in done and dep not in active:
+                    stack.append((dep, iter(sorted(deps[dep]))))
+                    active.add(dep)
+                    break
+            else:
+                stack.pop()
+                active.discard(p)
+                if p not in done:
+                    done.add(p)
+                    ordered.append(nodes[p])
     return ordered
 
 
@@ -42,6 +42,9 @@ class _Registry:
 
 Registry = _Registry()
 
+#: Functions to be invoked whenever a provider is registered.
+_registrationCallbacks = []
+
 
 #log = open("/tmp/cs-coord.log", "w")
 
@@ -88,6 +91,22 @@ def registerProvider(groupName, serviceSet, provider):
     for s in serviceSet:
         group.addServiceProvider(s, provider)
         # log.write("REG: %-20s <= %12s: %s\n" % (s, groupName, provider))
+    for func in _registrationCallbacks:
+        func()
+
+
+def addRegistrationCallback(func):
+    """Add a function to be invoked whenever a provider is registered.
+
+    This allows modules that cache service providers to know when the cached
+    values may have become stale.
+
+    :Parameters:
+        func
+            The function to invoke. It is called with no arguments.
+
+    """
+    _registrationCallbacks.append(func)
 
 
 def getServiceProvider(*serviceSet):
@@ -57,6 +57,19 @@ EXIT_SUITE = State("EXIT_SUITE")
 EXIT_ALL = State("EXIT_ALL")
 USER_STOPPED = State("USER_STOPPED")
 
+#: The states that do not indicate that a test phase has gone wrong.
+_OK_STATES = frozenset((PASS, SKIPPED, NOT_RUN, TODO, BUG, BUG_PASS))
+
+#: The set-up states that do not prevent a test from being considered run.
+_SETUP_OK_STATES = frozenset((PASS, BUG, BUG_PASS))
+
+#: The phase states that, by themselves, leave `RunRecord.isRunnable` false.
+_RUNNABLE_OK_STATES = frozenset((PASS, SKIPPED, NOT_RUN))
+
+#: The states that mean a single step has failed.
+_FAILED_STATES = frozenset((FAIL, BAD_SETUP))
+
+
 def dedentLines(lines):
      return textwrap.dedent("\n".join(lines)).splitlines()
 
@@ -98,8 +111,8 @@ class TestInfo:
         self.cs_flags = {}
         self.cs_tags = {}
         for arg in args:
-            if ":" in arg:
-                name, value = arg.split(":", 1)
+            name, sep, value = arg.partition(":")
+            if sep:
                 self.cs_flags[name] = value
             else:
                 self.cs_flags[arg] = True
@@ -111,6 +124,19 @@ class TestInfo:
                 self.cs_tags[name] = kwargs[name]
         self.reserved_cs_flags['defined_in_base'] = None
 
+        # The flags that `Test` queries are fixed once decorated, so work
+        # them out now. A reserved (``cs_``) flag takes precedence over the
+        # deprecated plain flag.
+        reserved, flags = self.reserved_cs_flags, self.cs_flags
+        self._broken = reserved.get("broken", None)
+        if self._broken is None:
+            self._broken = flags.get("broken", False)
+        self._bug = reserved.get("bug", None)
+        if self._bug is None:
+            self._bug = flags.get("bug", False)
+        self._todo = flags.get("todo", False)
+        self._fork = reserved.get("fork", False)
+
     def __getattr__(self, name):
         """Attribute access:
 
@@ -123,13 +149,30 @@ class TestInfo:
         be ``"Hello"``. If the test does not have ``abc`` set then the result
         is ``None``.
         """
-        if name in self.__dict__:
-            return self.__dict__.get(name)
+        # Normal attributes never get here. Special names are not tags and are
+        # typically probed by copy, pickle, etc.
+        if name.startswith("__"):
+            raise AttributeError(name)
         return self.cs_tags.get(name, None)
 
 
+def _restoreSlots(obj, state):
+    """Restore the pickled state of an instance of a slotted class.
+
+    Journals written before the record classes used ``__slots__`` hold a
+    plain dictionary. Newer ones hold a ``(None, slotState)`` pair.
+
+    """
+    if isinstance(state, tuple):
+        state = state[1] or {}
+    for name, value in state.items():
+        setattr(obj, name, value)
+
+
 class Result:
     """Full result details for a test."""
+    __slots__ = ("state", "reason")
+
     def __init__(self, state, reason):
         self.state, self.reason = state, reason
 
@@ -157,11 +200,17 @@ class StepRecord:
         TODO
 
     """
+    __slots__ = ("result", "reason", "exc", "reported",
+                 "_state", "_reason", "_details")
+
     def __init__(self, result=NOT_RUN, reason=NONE, details=None):
         self.result, self.reason = result, reason
         self.exc = None
         self.reported = False
 
+    def __setstate__(self, state):
+        _restoreSlots(self, state)
+
     def setResult(self, state, reason=NONE, details=None):
         self._state, self._reason = state, reason
         self._details = details
@@ -173,22 +222,27 @@ class StepRecord:
 
     @property
     def hasFailed(self):
-        return self.result in (FAIL, BAD_SETUP)
+        return self.result in _FAILED_STATES
 
     def __str__(self):
         return "StepRecord: %s/%s" % (self.state, self.reason)
 
 
 class StepRecordList:
+    __slots__ = ("entries",)
+
     def __init__(self):
         self.entries = []
 
+    def __setstate__(self, state):
+        _restoreSlots(self, state)
+
 
 class RunRecord:
     """A set of records containing all information about a single test's run.
 
-    This stores multiple `StepRecord` instances. The records are stored in a
-    dictionary keyed by the following names:
+    This stores multiple `StepRecord` instances. The records are stored in
+    attributes named after the following phases, with a leading underscore:
 
     setUp, tearDown, prevTearDown, rn
         Each maps to a single `StepRecord`.
@@ -197,21 +251,37 @@ class RunRecord:
         Each mapping to a list of `StepRecord` instances, in execution order.
 
     """
-    _simpleNames = """setUp tearDown prevTearDown run postCheck""".split()
-    _listNames = """suiteSetUp suiteTearDown prevSuiteTearDown""".split()
-    _recordNames = _simpleNames + _listNames
+    _simpleNames = frozenset(
+        """setUp tearDown prevTearDown run postCheck""".split())
+    _listNames = frozenset(
+        """suiteSetUp suiteTearDown prevSuiteTearDown""".split())
+    _recordNames = _simpleNames | _listNames
+    _recordAttrs = {name: "_" + name for name in _recordNames}
     _runTime = None
+    __slots__ = ("runTime", "invalid", "extraInfo", "_setUp", "_tearDown",
+                 "_prevTearDown", "_run", "_postCheck", "_suiteSetUp",
+                 "_suiteTearDown", "_prevSuiteTearDown")
 
     def __init__(self):
         #assert RunRecord._runTime is not None
         self.runTime = RunRecord._runTime
         self.invalid = False
-        self._records = {}
         self.extraInfo = {}
+        self._setUp = self._tearDown = self._prevTearDown = None
+        self._run = self._postCheck = None
+        self._suiteSetUp = self._suiteTearDown = None
+        self._prevSuiteTearDown = None
 
     def __setstate__(self, state):
         self.invalid = False
-        self.__dict__.update(state)
+        for attr in RunRecord._recordAttrs.values():
+            setattr(self, attr, None)
+        if isinstance(state, dict) and "_records" in state:
+            # Older journals hold the phase records in a dictionary.
+            state = dict(state)
+            for name, record in state.pop("_records").items():
+                setattr(self, RunRecord._recordAttrs[name], record)
+        _restoreSlots(self, state)
 
     @classmethod
     def startNewRun(cls):
@@ -238,14 +308,17 @@ class RunRecord:
 
         """
         assert name in RunRecord._recordNames
+        attr = RunRecord._recordAttrs[name]
         record = StepRecord()
         if name in RunRecord._simpleNames:
-            assert name not in self._records
-            self._records[name] = record
+            assert getattr(self, attr) is None
+            setattr(self, attr, record)
         else:
-            if name not in self._records:
-                self._records[name] = StepRecordList()
-            self._records[name].entries.append(record)
+            seq = getattr(self, attr)
+            if seq is None:
+                seq = StepRecordList()
+                setattr(self, attr, seq)
+            seq.entries.append(record)
         return record
 
     def getResult(self, name):
@@ -254,116 +327,87 @@ class RunRecord:
     @property
     def result(self):
         # Is set-up failed then we report that as bad setup.
-        try:
-            rec = self._records["setUp"]
-        except KeyError:
-            pass
-        else:
-            if rec.state is not PASS:
-                result = Result(BAD_SETUP, BAD_SETUP)
-                return result
+        rec = self._setUp
+        if rec is not None and rec.state is not PASS:
+            return Result(BAD_SETUP, BAD_SETUP)
 
         # See if the test was actually executed.
-        try:
-            rec = self._records["run"]
-        except KeyError:
-            pass
-        else:
-            result = Result(rec.state, rec.reason)
-            return result
+        rec = self._run
+        if rec is not None:
+            return Result(rec.state, rec.reason)
 
         # Test was not run, so we need to find out why. A suite set-up
         # failure means we consider the test not-run.
-        for rec in self._records.get("suiteSetUp", []):
-            if rec.state is not PASS:
-                return Result(NOT_RUN, BAD_SUITE_SETUP)
-
-        try:
-            rec = self._records["setUp"]
-        except KeyError:
-            pass
-        else:
-            if rec.state is not PASS:
-                return Result(NOT_RUN, BAD_SETUP)
+        seq = self._suiteSetUp
+        if seq is not None:
+            for rec in seq.entries:
+                if rec.state is not PASS:
+                    return Result(NOT_RUN, BAD_SUITE_SETUP)
 
         return Result(NOT_RUN, NONE)
 
     @property
     def state(self):
         # If set-up failed then we report that as bad setup.
-        try:
-            rec = self._records["setUp"]
-        except KeyError:
-            pass
-        else:
+        rec = self._setUp
+        if rec is not None:
             if rec.state is NOT_RUN:
                 return NOT_RUN
-            if rec.state not in (PASS, BUG, BUG_PASS):
+            if rec.state not in _SETUP_OK_STATES:
                 return BAD_SETUP
 
         # If the test has a 'run' entry then that defines the state.
-        try:
-            rec = self._records["run"]
-            #if rec.state is NOT_RUN:
-            #    return RUNNING
+        rec = self._run
+        if rec is not None:
             return rec.state
-        except KeyError:
-            pass
 
         # Otherwise the state is not-run.
         return NOT_RUN
 
     @property
     def isRunnable(self):
-        for name in ("suiteTearDown", "tearDown", "suiteSetUp", "setUp"):
-            try:
-                if self._records[name].state not in (PASS, SKIPPED, NOT_RUN):
-                    return True
-            except KeyError:
-                pass
+        for rec in (self._suiteTearDown, self._tearDown, self._suiteSetUp,
+                    self._setUp):
+            if rec is not None and rec.state not in _RUNNABLE_OK_STATES:
+                return True
 
         return False
 
-    @property
-    def hasRunProblem(self):
-        for name in ("tearDown", "suiteTearDown", "suiteSetUp", "setUp",
-                "run", "postCheck"):
-            try:
-                record = self._records[name]
-            except KeyError:
-                continue
+    def _hasBadStep(self, names):
+        """Check whether any of the named phases has a step that went wrong.
 
-            if name in ("tearDown", "setUp", "run", "postCheck"):
-                if record.state not in (PASS, SKIPPED, NOT_RUN,
-                        TODO, BUG, BUG_PASS):
-                    return True
-            else:
-                for rec in record.entries:
-                    if rec.state not in (PASS, SKIPPED, NOT_RUN,
-                            TODO, BUG, BUG_PASS):
-                        return True
+        :Parameters:
+          names
+            The names of the phases to check.
 
-        return False
+        :Return:
+            ``True`` if any recorded step's state is not one of the
+            `_OK_STATES`.
 
-    @property
-    def hasFailed(self):
-        for name in ("suiteSetUp", "setUp", "run"):
-            try:
-                record = self._records[name]
-            except KeyError:
+        """
+        attrs = RunRecord._recordAttrs
+        for name in names:
+            record = getattr(self, attrs[name])
+            if record is None:
                 continue
-            if name in ("setUp", "run"):
-                if record.state not in (PASS, SKIPPED, NOT_RUN, TODO, BUG,
-                        BUG_PASS):
-                    return True
-            else:
+            if name in RunRecord._listNames:
                 for rec in record.entries:
-                    if rec.state not in (PASS, SKIPPED, NOT_RUN,
-                        TODO, BUG, BUG_PASS):
+                    if rec.state not in _OK_STATES:
                         return True
+            elif record.state not in _OK_STATES:
+                return True
 
         return False
 
+    @property
+    def hasRunProblem(self):
+        return self._hasBadStep(("tearDown", "suiteTearDown", "suiteSetUp",
+                                 "setUp", "run", "postCheck"))
+
+    @property
+    def hasFailed(self):
+        return self._hasBadStep(("suiteSetUp", "setUp", "run"))
+
     @property
     def phaseRecord(self):
         """Get the most recent phaseRecord.
@@ -374,13 +418,12 @@ class RunRecord:
         TODO: This is not yet well defined.
 
         """
-        for name in ("tearDown", "run", "setUp"):
-            try:
-                return name, self._records[name]
-            except KeyError:
-                pass
+        for name, rec in (("tearDown", self._tearDown), ("run", self._run),
+                          ("setUp", self._setUp)):
+            if rec is not None:
+                return name, rec
         #return None, None
-        seq = self._records.get("suiteSetUp", None)
+        seq = self._suiteSetUp
         if seq is None:
             return None, None
         for ent in seq.entries:
@@ -390,7 +433,8 @@ class RunRecord:
 
     def getStepRecord(self, phase):
         """Get the record details for a test run phase."""
-        ent = self._records.get(phase, None)
+        attr = RunRecord._recordAttrs.get(phase)
+        ent = None if attr is None else getattr(self, attr)
         if hasattr(ent, "append"): # Yurk!
             seq = ent
             for ent in seq:
@@ -408,6 +452,32 @@ class RunRecord:
         return ent
 
 
+class _AttrNamespace:
+    """A read-only, dictionary like, view of an object's attributes.
+
+    This is used as the namespace of a test item that is not given one. It
+    avoids building a dictionary of every attribute, when only a few are
+    ever looked up.
+
+    """
+    __slots__ = ("_obj",)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self._obj, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return hasattr(self._obj, name)
+
+    def get(self, name, default=None):
+        return getattr(self._obj, name, default)
+
+
 class TestItem:
     """Base class for `Test` and `Suite` classes.
 
@@ -440,21 +510,23 @@ class TestItem:
         self.namespace = self._getNamespace(namespace)
         self._collection = None
         self._running = False
-        self._marks = {}
+        self._marks = set()
+        self._docParts = None
+        self._path = None
+        self._sources = None
         self.extraInfo = {}
 
     def setMark(self, mark):
-        self._marks[mark] = None
+        self._marks.add(mark)
 
     def clearMark(self, mark):
-        if mark in self._marks:
-            del self._marks[mark]
+        self._marks.discard(mark)
 
     def isMarked(self, mark):
         return mark in self._marks
 
     def setCollection(self, collection):
-        self._collection = weakref.proxy(collection)
+        self._collection = collection
 
     # TODO: To remove.
     def setPhase(self, phase):
@@ -480,7 +552,7 @@ class TestItem:
         the 'root' item.
 
         """
-        return len(self.ancestors)
+        return self._collection.getLevel(self)
 
     @intelliprop
     def parent(self):
@@ -520,8 +592,7 @@ class TestItem:
         return parent.hasFailed or parent.hasFailingAncestor()
 
     def _getNamespace(self, namespace=None):
-        return namespace or dict([(n, getattr(self.item, n))
-            for n in dir(self.item)])
+        return namespace or _AttrNamespace(self.item)
 
     @intelliprop
     def rawDoc(self):
@@ -544,7 +615,7 @@ class TestItem:
         summary, description = self._getDocParts()
         if description:
             return summary + [""] + description
-        return summary
+        return list(summary)
 
     @intelliprop
     def doc(self):
@@ -560,6 +631,12 @@ class TestItem:
         return "\n".join(self.docLines)
 
     def _getDocParts(self):
+        # The docstring does not change, so it only needs parsing once.
+        if self._docParts is None:
+            self._docParts = self._parseDoc()
+        return self._docParts
+
+    def _parseDoc(self):
         # Lose leading blank lines.
         lines = self.rawDoc.splitlines()
         while lines and not lines[0].strip():
@@ -589,18 +666,27 @@ class TestItem:
     @property
     def details(self):
         summary, description = self._getDocParts()
-        return description
+        return list(description)
 
     @property
     def sourcesUnderTest(self):
-        sources = []
-        for p in self.namespace.get("sources_under_test", []):
-            if not os.path.isabs(p):
-                p = os.path.abspath(os.path.join(self.dirname, p))
-            sources.append(p)
-        p = self.parent
-        if p is not None:
-            sources.extend(p.sourcesUnderTest)
+        return list(self._getSources())
+
+    def _getSources(self):
+        # Each item's sources are worked out once. An item's parent does the
+        # same, so the ancestors are not walked again for each of their
+        # children.
+        sources = self._sources
+        if sources is None:
+            sources = []
+            for p in self.namespace.get("sources_under_test", []):
+                if not os.path.isabs(p):
+                    p = os.path.abspath(os.path.join(self.dirname, p))
+                sources.append(p)
+            parent = self.parent
+            if parent is not None:
+                sources.extend(parent._getSources())
+            sources = self._sources = tuple(sources)
         return sources
 
     @property
@@ -609,11 +695,14 @@ class TestItem:
 
     @property
     def path(self):
-        p = self.namespace.get("__file__", None)
+        p = self._path
         if p is None:
-            return self.parent.path
-        if p.endswith(".pyc"):
-            p = p[:-1]
+            p = self.namespace.get("__file__", None)
+            if p is None:
+                p = self.parent.path
+            elif p.endswith(".pyc"):
+                p = p[:-1]
+            self._path = p
         return p
 
     @property
@@ -687,39 +776,30 @@ class Test(TestItem):
     def info(self):
         return self.func.cs_test_info
 
-    @property
-    def isBroken(self):
-        if not hasattr(self, "info"):
+    def _requireInfo(self):
+        # Fetch the info just once, rather than probing for it with hasattr
+        # and then fetching it again.
+        try:
+            return self.info
+        except AttributeError:
             raise PropertyError("%r has no attribute %r" % (
                 self.__class__.__name__, "info"))
-        flag = self.info.reserved_cs_flags.get("broken", None)
-        if flag is None:
-            flag = self.info.cs_flags.get("broken", False) # deprecated
-        return flag
+
+    @property
+    def isBroken(self):
+        return self._requireInfo()._broken
 
     @property
     def isTodo(self):
-        if not hasattr(self, "info"):
-            raise PropertyError("%r has no attribute %r" % (
-                self.__class__.__name__, "info"))
-        return self.info.cs_flags.get("todo", False)
+        return self._requireInfo()._todo
 
     @property
     def isBug(self):
-        if not hasattr(self, "info"):
-            raise PropertyError("%r has no attribute %r" % (
-                self.__class__.__name__, "info"))
-        flag = self.info.reserved_cs_flags.get("bug", None)
-        if flag is None:
-            flag = self.info.cs_flags.get("bug", False) # deprecated
-        return flag
+        return self._requireInfo()._bug
 
     @property
     def shouldFork(self):
-        if not hasattr(self, "info"):
-            raise PropertyError("%r has no attribute %r" % (
-                self.__class__.__name__, "info"))
-        if self.info.reserved_cs_flags.get("fork", False):
+        if self._requireInfo()._fork:
             return True
         parent = self.parent
         try:
@@ -773,14 +853,19 @@ class Test(TestItem):
 
     def addRunRecord(self, record):
         self._runHistory.append(record)
-        if len(self._runHistory) > 5:
-            self._runHistory[:] = self._runHistory[-5:]
+        del self._runHistory[:-5]
 
     @property
     def runRecord(self):
         """The XXX TODO"""
-        if self._runHistory:
-            for rec in reversed(self._runHistory):
+        hist = self._runHistory
+        if hist:
+            # The latest record is nearly always the valid one.
+            rec = hist[-1]
+            if not rec.invalid:
+                return rec
+            for i in range(len(hist) - 2, -1, -1):
+                rec = hist[i]
                 if not rec.invalid:
                     return rec
 
@@ -842,14 +927,13 @@ class Suite(TestItem):
     @intelliprop
     def children(self):
         """All the direct children of this item."""
-        tests = [t for t in self._collection if t.parent is self]
-        suites = [t for t in self._collection.suites if t.parent is self]
+        suites, tests = self._collection.getChildren(self)
         return suites + tests
 
     @intelliprop
     def tests(self):
         """All the direct test children of this item."""
-        return [t for t in self._collection if t.parent is self]
+        return list(self._collection.getChildren(self)[1])
 
     @property
     def suite(self):
@@ -886,20 +970,23 @@ class Suite(TestItem):
 
     def getResult(self, name=None):
         runCount = 0
-        childStates = {}
+        childStates = set()
         result = Result(PASS, NONE)
-        if not self.children:
+        children = self.children
+        if not children:
             result.state = NOT_RUN
             return result
 
-        for c in self.children:
+        for c in children:
             state = c.state
+            if state == FAIL:
+                # A failure overrides everything else.
+                result.state = CHILD_FAIL
+                return result
             runCount += state is not NOT_RUN
-            childStates[state] = None
+            childStates.add(state)
 
-        if FAIL in childStates:
-            result.state = CHILD_FAIL
-        elif CHILD_FAIL in childStates:
+        if CHILD_FAIL in childStates:
             result.state = CHILD_FAIL
         elif BAD_SETUP in childStates:
             result.state = CHILD_FAIL
@@ -924,9 +1011,7 @@ class Suite(TestItem):
 
     def hasTests(self):
         # Deprecated. Only used for old reporter support.
-        for t in self._collection:
-            if t.parent is self:
-                return True
+        return bool(self._collection.getChildren(self)[1])
 
 
 class ModuleSuite(Suite):
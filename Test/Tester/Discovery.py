@@ -13,7 +13,7 @@ from cleversheep3.Test import ImpUtils
 
 #: DEPRECATED: This stores the names of all python module source files that are
 #: defined to be under test. It is used to generate coverage reports.
-modules_under_test = {}
+modules_under_test = set()
 
 
 def addModulesUnderTest(pathOrPaths, moduleDir=None):
@@ -49,4 +49,4 @@ def addModulesUnderTest(pathOrPaths, moduleDir=None):
             continue
         if not os.path.isabs(path):
             path = os.path.abspath(os.path.join(moduleDir, path))
-        modules_under_test[path] = None
+        modules_under_test.add(path)
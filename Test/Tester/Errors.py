@@ -158,6 +158,23 @@ def saveStack(theStack, savedBy="Anon"):
     return _filterStack(stack)
 
 
+def normaliseStack(stack):
+    """Make sure that every entry of a saved stack has a meta element.
+
+    Stacks may be provided with entries of the form::
+
+        (fileName, lineNum, funcName, context, ctxOffset)
+
+    This detects that form, once for the whole stack, and returns a list where
+    an empty ``meta`` has been added to each entry. A stack that already has
+    the full form is returned unchanged.
+
+    """
+    if stack and len(stack[0]) == 5:
+        return [tuple(x) + ((),) for x in stack]
+    return stack
+
+
 class ExitSuite(Exception):
     """Raised when the suite should terminate."""
 
@@ -270,14 +287,10 @@ class TestNoDocstringError(DiscoveryError):
 def fmtException(exc):
     #assert 0
     from cleversheep3.Prog import Files
-    stack = exc.stack
+    stack = normaliseStack(exc.stack)
     lines = []
     lines.append("%s" % exc)
-    for i, x in enumerate(stack):
-        try:
-            path, lnum, funcName, context, lineIdx = x
-        except ValueError:
-            path, lnum, funcName, context, lineIdx, _ = x
+    for i, (path, lnum, funcName, context, lineIdx, _) in enumerate(stack):
         lines.append("%s: %s" % (Files.relName(path),
             funcName))
         lines.extend(_fmtStackFrame(path, lnum, funcName, context,
@@ -87,6 +87,39 @@ class MultiLineFormatter(logging.Formatter):
         self.hooks.append(func)
 
 
+class BufferedFileHandler(logging.FileHandler):
+    """A file handler that does not flush the file after every record.
+
+    The standard handler flushes after each record, which costs a system call
+    for every line a test logs. This one only flushes when `flushInterval`
+    seconds have passed since the last flush, or when the record is a warning
+    or worse. Use `flush` (the module function) to force buffered output out.
+
+    """
+    #: The longest time, in seconds, that a record may sit in the buffer
+    #: (provided something else gets logged).
+    flushInterval = 0.25
+
+    def __init__(self, *args, **kwargs):
+        logging.FileHandler.__init__(self, *args, **kwargs)
+        self._lazyFlush = False
+        self._lastFlush = time.time()
+
+    def emit(self, record):
+        self._lazyFlush = record.levelno < logging.WARNING
+        try:
+            logging.FileHandler.emit(self, record)
+        finally:
+            self._lazyFlush = False
+
+    def flush(self):
+        now = time.time()
+        if self._lazyFlush and now - self._lastFlush < self.flushInterval:
+            return
+        logging.FileHandler.flush(self)
+        self._lastFlush = now
+
+
 #: The core logger is where all output goes (eventually)
 coreLog = logging.getLogger("cs_test")
 coreLog.propagate = False
@@ -121,9 +154,10 @@ def getLogger(*args, **kwargs):
     return logging.getLogger(*args, **kwargs)
 
 
-# TODO: Decide whether this should do something.
 def flush():
-    pass
+    """Write out any log output that is being buffered."""
+    if logFile:
+        logFile.flush()
 
 
 def set_columns(columns):
@@ -210,12 +244,12 @@ def _setLogPath(path):
         coreLog.removeHandler(logFile)
 
     if path is None:
-        logFile = logging.FileHandler("/dev/null", "w")
+        logFile = BufferedFileHandler("/dev/null", "w")
     else:
         if not os.path.isabs(path):
             from cleversheep3.Test import Tester
             path = os.path.join(Tester.execDir, path)
-        logFile = logging.FileHandler(path, "w")
+        logFile = BufferedFileHandler(path, "w")
 
     logFile.setLevel(logging.DEBUG)
     logFile.setFormatter(logFormatter)
@@ -6,7 +6,6 @@ default (currently only) manager for the framework.
 """
 __docformat__ = "restructuredtext"
 
-import functools
 import inspect
 import linecache
 import os
@@ -15,9 +14,6 @@ import time
 import traceback
 import weakref
 
-from multiprocessing import Process, Queue
-from queue import Empty
-
 from cleversheep3.Prog import Aspects
 from cleversheep3.Prog import Files
 from cleversheep3.Test.Tester import Core
@@ -966,6 +962,10 @@ class TestExecEnvironment(_TestProcessor):
             test.abortRun()
 
     def _runForked(self, level):
+        # Only forked tests need multiprocessing, so the import is deferred
+        # until one is run.
+        from cleversheep3.Test.Tester.SubRunner import SubRunner
+
         self.runner = runner = SubRunner(self)
         suite = self._test.parent
         setUp = Executor(suite.setUp, self._test, "setUp",
@@ -1016,109 +1016,6 @@ class TestExecEnvironment(_TestProcessor):
         test.startNewRun()
 
 
-class ServiceProxy:
-    def __init__(self, subRunner, proxied, group, services):
-        self._subRunner = weakref.proxy(subRunner)
-        self._proxied = proxied
-        Coordinator.registerProvider(group, services, self)
-        self._service = services[0]
-
-    def __getattr__(self, name):
-        attr = getattr(self._proxied, name)
-        if not callable(attr):
-            return attr
-        return functools.partial(self._invoker, name)
-
-    def _invoker(self, name, *args, **kwargs):
-        self._subRunner.reportQ.put(("CS", (self._service, name, args, kwargs)))
-
-
-class SubRunner(Process):
-    def __init__(self, inst):
-        super(SubRunner, self).__init__()
-        self.commandQ = Queue()
-        self.reportQ = Queue()
-        self.retQ = Queue()
-        self.inst = inst
-        self._clients = {}
-        self._proxies = []
-
-    def run(self):
-        self.f = open("hack.log", "w")
-        self._reportMan = Coordinator.getServiceProvider("report_manager")
-        self._status = Coordinator.getServiceProvider("status")
-        self._proxies.append(ServiceProxy(self, self._reportMan,
-                                          "cscore", ("report_manager",)))
-        self._proxies.append(ServiceProxy(self, self._status,
-                                          "cscore", ("status",)))
-
-        while True:
-            cmd, data = self.commandQ.get()
-            if cmd == "Q":
-                return
-
-            elif cmd == "CF":
-                try:
-                    clientID, funcName, args, kwargs = data
-                    attr = self._clients[clientID]
-                    func = getattr(attr, funcName)
-                    v = func(*args, **kwargs)
-                    self.retQ.put((None, v))
-                except Exception as exc:
-                    stack = Errors.saveStack(inspect.trace(7), "MAN")
-                    self.retQ.put((exc, stack))
-
-    def _getThing(self, name):
-        self.f.write("_getThing %r\n" % (name, ))
-        self.f.flush()
-        try:
-            return "_reportMan", getattr(self._reportMan, name)
-        except AttributeError:
-            try:
-                return "_status", getattr(self._status, name)
-            except AttributeError:
-                return "stdout", getattr(self._stdout, name)
-
-    def __getattr__(self, funcName):
-        attrName, _ = self._getThing(funcName)
-        return functools.partial(self._invoker, attrName, funcName)
-
-    def callFunc(self, clientID, funcName, *args, **kwargs):
-        self.commandQ.put(("CF", (clientID, funcName, args, kwargs)))
-        while True:
-            try:
-                exc, ret = self.retQ.get(False, 0.02)
-            except Empty:
-                pass
-            else:
-                if exc:
-                    exc.procStack = ret
-                    raise exc
-                return ret
-
-            try:
-                cmd, data = self.reportQ.get(False)
-            except Empty:
-                pass
-            else:
-                service, name, args, kwargs = data
-                provider = Coordinator.getServiceProvider(service)
-                func = getattr(provider, name)
-                func(*args, **kwargs)
-
-    def _invoker(self, name, funcName, *args, **kwargs):
-        self.commandQ.put(("F", (name, funcName, args, kwargs)))
-        exc, ret = self.retQ.get()
-        if exc:
-            exc.procStack = ret
-            raise exc
-        return ret
-
-    def addClient(self, client):
-        self._clients[id(client)] = client
-        client.setRunner(self)
-
-
 class Executor:
     def __init__(self, func, test, phase, item=None, timeout=None,
             record=None, postFunc=None, trace=None):
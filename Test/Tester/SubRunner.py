@@ -0,0 +1,121 @@
+"""Support for running a test in a separate process.
+
+This provides the `SubRunner`, which the `Manager` uses to execute tests that
+should be forked, and the `ServiceProxy` that the child process uses to pass
+reporting calls back to the parent's service providers.
+
+"""
+__docformat__ = "restructuredtext"
+
+import functools
+import inspect
+import weakref
+
+from multiprocessing import Process, Queue
+from queue import Empty
+
+from cleversheep3.Test.Tester import Coordinator
+from cleversheep3.Test.Tester import Errors
+
+
+class ServiceProxy:
+    def __init__(self, subRunner, proxied, group, services):
+        self._subRunner = weakref.proxy(subRunner)
+        self._proxied = proxied
+        Coordinator.registerProvider(group, services, self)
+        self._service = services[0]
+
+    def __getattr__(self, name):
+        attr = getattr(self._proxied, name)
+        if not callable(attr):
+            return attr
+        return functools.partial(self._invoker, name)
+
+    def _invoker(self, name, *args, **kwargs):
+        self._subRunner.reportQ.put(("CS", (self._service, name, args, kwargs)))
+
+
+class SubRunner(Process):
+    def __init__(self, inst):
+        super(SubRunner, self).__init__()
+        self.commandQ = Queue()
+        self.reportQ = Queue()
+        self.retQ = Queue()
+        self.inst = inst
+        self._clients = {}
+        self._proxies = []
+
+    def run(self):
+        self.f = open("hack.log", "w")
+        self._reportMan = Coordinator.getServiceProvider("report_manager")
+        self._status = Coordinator.getServiceProvider("status")
+        self._proxies.append(ServiceProxy(self, self._reportMan,
+                                          "cscore", ("report_manager",)))
+        self._proxies.append(ServiceProxy(self, self._status,
+                                          "cscore", ("status",)))
+
+        while True:
+            cmd, data = self.commandQ.get()
+            if cmd == "Q":
+                return
+
+            elif cmd == "CF":
+                try:
+                    clientID, funcName, args, kwargs = data
+                    attr = self._clients[clientID]
+                    func = getattr(attr, funcName)
+                    v = func(*args, **kwargs)
+                    self.retQ.put((None, v))
+                except Exception as exc:
+                    stack = Errors.saveStack(inspect.trace(7), "MAN")
+                    self.retQ.put((exc, stack))
+
+    def _getThing(self, name):
+        self.f.write("_getThing %r\n" % (name, ))
+        self.f.flush()
+        try:
+            return "_reportMan", getattr(self._reportMan, name)
+        except AttributeError:
+            try:
+                return "_status", getattr(self._status, name)
+            except AttributeError:
+                return "stdout", getattr(self._stdout, name)
+
+    def __getattr__(self, funcName):
+        attrName, _ = self._getThing(funcName)
+        return functools.partial(self._invoker, attrName, funcName)
+
+    def callFunc(self, clientID, funcName, *args, **kwargs):
+        self.commandQ.put(("CF", (clientID, funcName, args, kwargs)))
+        while True:
+            try:
+                exc, ret = self.retQ.get(False, 0.02)
+            except Empty:
+                pass
+            else:
+                if exc:
+                    exc.procStack = ret
+                    raise exc
+                return ret
+
+            try:
+                cmd, data = self.reportQ.get(False)
+            except Empty:
+                pass
+            else:
+                service, name, args, kwargs = data
+                provider = Coordinator.getServiceProvider(service)
+                func = getattr(provider, name)
+                func(*args, **kwargs)
+
+    def _invoker(self, name, funcName, *args, **kwargs):
+        self.commandQ.put(("F", (name, funcName, args, kwargs)))
+        exc, ret = self.retQ.get()
+        if exc:
+            exc.procStack = ret
+            raise exc
+        return ret
+
+    def addClient(self, client):
+        self._clients[id(client)] = client
+        client.setRunner(self)
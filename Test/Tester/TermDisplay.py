@@ -11,6 +11,7 @@ import os
 
 from cleversheep3.Test.Tester import Coordinator
 from cleversheep3.Test.Tester import Core
+from cleversheep3.Test.Tester import Errors
 
 from cleversheep3.Sys.Platform import platformType
 from cleversheep3.Prog import Files
@@ -18,6 +19,7 @@ from cleversheep3.TTY_Utils import Colours
 from cleversheep3.Test.Tester import Logging
 from cleversheep3.TTY_Utils import StatusLine
 from cleversheep3.Test.Tester import options, Tty
+from cleversheep3.Test.Tester import testspec
 
 
 class Terminal:
@@ -55,26 +57,31 @@ class Terminal:
         self.stderr = stderr
         self.lineCount = 0
         self.column = 0
+        self.refreshIsatty()
+
+    def refreshIsatty(self):
+        """Re-evaluate whether the output stream is a TTY.
+
+        The answer is cached because `nl` is invoked very frequently. Call
+        this if the underlying stream is changed.
+
+        """
+        self._isatty = self.stdout.isatty()
 
     def write(self, s):
-        lines = s.splitlines(True)
-        if not lines:
+        if not s:
             return
-        lines, last = lines[:-1], lines[-1]
-        for line in lines:
-            self.stdout.write(line)
-            self.lineCount += 1
-            self.column = 0
-        self.stdout.write(last)
-        if last.endswith("\n"):
-            self.lineCount += 1
-            self.column = 0
+        self.stdout.write(s)
+        newlines = s.count("\n")
+        if newlines:
+            self.lineCount += newlines
+            self.column = len(s) - s.rfind("\n") - 1
         else:
-            self.column += len(last)
+            self.column += len(s)
         self.stdout.flush()
 
     def nl(self, count=1):
-        if self.stdout.isatty():
+        if self._isatty:
             self.write("\n" * count)
 
     def __getattr__(self, name):
@@ -82,18 +89,35 @@ class Terminal:
 
 
 _terminal = None
+_terminalValid = False
+
+def invalidateTerminal():
+    """Force the next `getStdout` call to check the current TTY provider.
+
+    This is invoked whenever a service provider is registered. Call it
+    directly if the TTY provider's output streams are changed.
+
+    """
+    global _terminalValid
+    _terminalValid = False
+
 
 def getStdout():
-    global _terminal
+    global _terminal, _terminalValid
 
+    if _terminalValid:
+        return _terminal
     tty = Coordinator.getServiceProvider("tty")
-    if _terminal is not None:
-        if tty.out is _terminal.stdout and tty.err is _terminal.stderr:
-            return _terminal
-    _terminal = Terminal(tty.out, tty.err)
+    if _terminal is None or not (
+            tty.out is _terminal.stdout and tty.err is _terminal.stderr):
+        _terminal = Terminal(tty.out, tty.err)
+    _terminalValid = True
     return _terminal
 
 
+Coordinator.addRegistrationCallback(invalidateTerminal)
+
+
 # Output streams for different purposes.
 sTestSummary = Colours.ColourStream(getStdout, fg="magenta")
 sFail = Colours.ColourStream(getStdout, fg="red", bold=True)
@@ -179,19 +203,72 @@ def _addHang(lines, hangText):
 
 
 
-def _ifNotNullTest(func):
-    def run(self, test, *args, **kwargs):
-        if not test.amNull:
-            return func(self, test, *args, **kwargs)
-    return run
+def _wrap(text, width):
+    """Wrap text to a given width.
 
+    This gives the same result as ``textwrap.wrap``, but handles the common
+    case of plain words separated by single spaces much more quickly. Other
+    text, such as that containing hyphens or words longer than the width, is
+    passed to ``textwrap.wrap``.
+
+    """
+    words = text.split()
+    if (not words or "-" in text or " ".join(words) != text
+            or max(map(len, words)) > width):
+        return textwrap.wrap(text, width)
+    if len(text) <= width:
+        return [text]
+
+    lines = []
+    line = [words[0]]
+    lineLen = len(words[0])
+    for word in words[1:]:
+        newLen = lineLen + 1 + len(word)
+        if newLen > width:
+            lines.append(" ".join(line))
+            line = [word]
+            lineLen = len(word)
+        else:
+            line.append(word)
+            lineLen = newLen
+    lines.append(" ".join(line))
+    return lines
 
-def _execOnly(func):
-    def run(self, *args, **kwargs):
-        if self.mode not in ("EXECUTION", "FAIL-SUMMARY"):
-            return
-        return func(self, *args, **kwargs)
-    return run
+
+def _formatContext(ind, lnum, context, lineIdx):
+    """Format the source context lines of a stack frame.
+
+    :Return:
+        A list of lines, one per line of context. The line at ``lineIdx`` is
+        marked with an arrow.
+
+    """
+    base = lnum - lineIdx
+    stripped = [line.rstrip() for line in context]
+    lines = [f"{ind}   {base + i:<4d}: {l}" if l else f"{ind}   {base + i:<4d}:"
+             for i, l in enumerate(stripped)]
+    lines[lineIdx] = f"{ind}==>{lnum:<4d}: {stripped[lineIdx]}"
+    return lines
+
+
+#: The modes in which interactive output is produced.
+_INTERACT_MODES = frozenset(("EXECUTION", "FAIL-SUMMARY", "SUMMARY", "DETAILS",
+                             "IDS-SUMMARY"))
+
+#: The modes in which test execution results are displayed.
+_EXEC_MODES = frozenset(("EXECUTION", "FAIL-SUMMARY"))
+
+#: The modes in which test execution is logged.
+_LOG_EXEC_MODES = frozenset(("EXECUTION", "RUN-SUMMARY", "FAIL-SUMMARY"))
+
+#: The modes in which logged details are not indented.
+_LOG_NO_IND_MODES = frozenset(("RUN-SUMMARY", "FAIL-SUMMARY", "NO_ACTION"))
+
+#: The modes in which general screen output is suppressed.
+_QUIET_MODES = frozenset(("RUN-SUMMARY", "NO_ACTION"))
+
+#: The modes in which test announcements are not followed by dots.
+_NO_DOTS_MODES = frozenset(("RUN-SUMMARY", "SUMMARY", "DETAILS"))
 
 
 def _messesStatus(func):
@@ -206,8 +283,7 @@ def _messesStatus(func):
 
 def _interactOnly(func):
     def run(self, *args, **kwargs):
-        if self.mode not in ("EXECUTION", "FAIL-SUMMARY", "SUMMARY", "DETAILS",
-                    "IDS-SUMMARY"):
+        if self.mode not in _INTERACT_MODES:
             return
         return func(self, *args, **kwargs)
     return run
@@ -215,7 +291,7 @@ def _interactOnly(func):
 
 def _logExecOnly(func):
     def run(self, *args, **kwargs):
-        if self.mode not in ("EXECUTION", "RUN-SUMMARY", "FAIL-SUMMARY"):
+        if self.mode not in _LOG_EXEC_MODES:
             return
         return func(self, *args, **kwargs)
     return run
@@ -239,9 +315,9 @@ class Reporter:
 
     """
     def __init__(self):
-        self.level = 0
         self._columns = 80
         self.mode = "EXEC"
+        self.level = 0
 
     def setField(self, name, s):
         pass
@@ -325,18 +401,37 @@ class Reporter:
 
         """
         self.mode = mode
+        self._updateIndents()
         self._setMode(mode)
 
     def _setMode(self, mode):
         pass
 
     @property
-    def indent(self):
-        return self.level * 2
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        self._level = level
+        self._updateIndents()
+
+    def _updateIndents(self):
+        """Recalculate the `pad` and `ind` strings.
+
+        These are used for almost every line of output, so they are stored as
+        plain attributes and only recalculated when the level or mode changes.
+
+        """
+        self.pad = " " * self.indent
+        self.ind = self._getInd()
+
+    def _getInd(self):
+        return self.pad
 
     @property
-    def pad(self):
-        return " " * self.indent
+    def indent(self):
+        return self.level * 2
 
     @property
     def columns(self):
@@ -368,7 +463,7 @@ class Reporter:
         if not isLines:
             summary = timeStr + summary
         if wrap:
-            lines = textwrap.wrap(summary, columns - 1)
+            lines = _wrap(summary, columns - 1)
             dotLen = columns - len(lines[-1]) - 1
             lines = _addHang(lines, leader)
             lines = _addPerLinePrefix(lines, self.pad)
@@ -560,32 +655,28 @@ class LogReporter(FileLikeReporter):
         ePad = " " * 6
         writer("%-6s %s%s%s", typ, self.pad, ePad, test.result.reportCode)
         self._extraPad = 7  # TODO: Messy!
+        Logging.flush()
 
-    @property
-    def ind(self):
-        if self.mode in ("RUN-SUMMARY", "FAIL-SUMMARY", "NO_ACTION"):
+    def _getInd(self):
+        if self.mode in _LOG_NO_IND_MODES:
             return ""
         return self.pad + "             "
 
     def _logFailException(self, exc):
-        stack = exc.stack
+        stack = Errors.normaliseStack(exc.stack)
         lines = []
         if exc.message:
-            ll = ["%s%s" % (self.ind, l) for l in exc.message.splitlines()]
+            ll = [f"{self.ind}{l}" for l in exc.message.splitlines()]
         else:
-            ll = ["%s%s" % (self.ind, l) for l in str(exc).splitlines()]
+            ll = [f"{self.ind}{l}" for l in str(exc).splitlines()]
         lines.extend(ll)
-        for i, x in enumerate(stack):
-            try:
-                path, lnum, funcName, context, lineIdx, meta = x
-            except ValueError:
-                path, lnum, funcName, context, lineIdx = x
-                meta = ()
+        last = len(stack) - 1
+        for i, frame in enumerate(stack):
+            path, lnum, funcName, context, lineIdx, meta = frame
             lines.append("%s%s: %s" % (self.ind, Files.relName(path),
                 funcName))
             self._logStackFrame(path, lnum, funcName, context, lineIdx, meta,
-                    showContext=(i == 0) or (i == len(stack) - 1),
-                    lines=lines)
+                    showContext=(i == 0) or (i == last), lines=lines)
         Logging.coreLog.error("%s", "\n".join(lines))
         return
 
@@ -603,26 +694,16 @@ class LogReporter(FileLikeReporter):
         lines = lines or None
         if not showContext or not context:
             if not context:
-                lines.append("%s   %-4d: <no context>" % (self.ind, lnum,))
+                lines.append(f"{self.ind}   {lnum:<4d}: <no context>")
             else:
                 l = context[lineIdx].rstrip()
-                if l.strip():
-                    lines.append("%s   %-4d: %s" % (self.ind, lnum, l))
+                if l:
+                    lines.append(f"{self.ind}   {lnum:<4d}: {l}")
                 else:
-                    lines.append("%s   %-4d:" % (self.ind, lnum, ))
+                    lines.append(f"{self.ind}   {lnum:<4d}:")
             return
 
-        for i, line in enumerate(context):
-            ci = i + lnum - lineIdx
-            l = line.rstrip()
-            if i == lineIdx:
-                lines.append("%s==>%-4d: %s" % (self.ind, ci, l))
-            else:
-                if l.strip():
-                    lines.append("%s   %-4d: %s" % (self.ind, ci, line.rstrip()))
-                else: #pragma: unreachable
-                    lines.append("%s   %-4d:" % (self.ind, ci, ))
-        #Logging.coreLog.error("%s", "\n".join(lines))
+        lines.extend(_formatContext(self.ind, lnum, context, lineIdx))
 
     def logStage(self, test, op, msg):
         step, phaseRecord = test.phaseRecord
@@ -703,7 +784,7 @@ class Screen(FileLikeReporter):
         self.status.update()
 
     def write(self, s):
-        if self.mode in ("RUN-SUMMARY", "NO_ACTION"):
+        if self.mode in _QUIET_MODES:
             return
         return super(Screen, self).write(s)
 
@@ -711,9 +792,8 @@ class Screen(FileLikeReporter):
     def _write(self, s):
         sConsole.write(s)
 
-    @property
-    def ind(self):
-        if self.mode in ("EXECUTION",):
+    def _getInd(self):
+        if self.mode == "EXECUTION":
             return self.pad + "      "
         return ""
 
@@ -754,17 +834,15 @@ class Screen(FileLikeReporter):
             return
         lines, textLen, dotLen = self.formatAnnouncement(details,
                 wrap=False, isLines=True)
-        for line in lines:
-            stream.write("%s%s\n" % (ind, line))
-        if details:
-            sNormal.write("\n")
+        stream.write("".join(["%s%s\n" % (ind, line) for line in lines])
+                     + "\n")
 
     def summariseSuiteResult(self, suite):
         """Provide a summary of a suite's result.
 
         """
         try:
-            if self.mode not in ["FAIL-SUMMARY"]:
+            if self.mode != "FAIL-SUMMARY":
                 return
             result = suite.result
             itemType = "suite"
@@ -780,7 +858,7 @@ class Screen(FileLikeReporter):
 
         """
         assert not test.isSuite
-        if self.mode not in ["FAIL-SUMMARY"]:
+        if self.mode != "FAIL-SUMMARY":
             return
         result = test.result
         itemType = "test"
@@ -828,97 +906,110 @@ class Screen(FileLikeReporter):
             if self.level == 0:
                 sNormal.write(")\n")
 
-    @_ifNotNullTest
-    @_messesStatus
-    @_interactOnly
     def announceTestStart(self, test, number, eol=True, result=None):
-        if self.mode == "DETAILS":
-            dotLen = self._announceItem(number=number, summary=test.summary,
-                    testID=test.testID, term="", stream=sTitle)
-            sNormal.write("\n")
-            if test.details:
-                sNormal.write("\n")
-                self._writeDetails(test.details, stream=sNormal, ind="      ")
-            else:
-                sNormal.write("\n")
-
-            ind = "          "
-            didSteps = False
-            spec = test.getTestProcedure()
-            # TODO: Code largely duplicated in sphinx.py.
-            prefixLens = [0] * 30
-            for n, block in spec.walkSteps():
-                num = ".".join("%d" % v for v in n) + ". "
-                idx = len(n)
-                prefixLens[idx] = max(len(num), prefixLens[idx])
-
-            for n, block in spec.walkSteps():
-                nn = len(n)
-                a, b = prefixLens[nn - 1:nn + 1]
-                b -= a
-                if n[-1] == 0:
-                    if n[0] == 0:
-                        sNormal.write("\n%-*sSetup\n" % (a, "1. "))
-                        n[0] += 1
+        if test.amNull or self.mode not in _INTERACT_MODES:
+            return
+        self.status.kill()
+        try:
+            if self.mode == "DETAILS":
+                dotLen = self._announceItem(number=number,
+                        summary=test.summary, testID=test.testID, term="",
+                        stream=sTitle)
                 sNormal.write("\n")
-
-                num = ".".join("%d" % v for v in n) + ". "
-                hangStr = "%*s%-*s" % (a, "", b, num)
-                for line in addHang(block, hangStr):
-                    sNormal.write("%s\n" % line)
-
-            if didSteps:
+                if test.details:
+                    sNormal.write("\n")
+                    self._writeDetails(test.details, stream=sNormal,
+                            ind="      ")
+                else:
+                    sNormal.write("\n")
+
+                ind = "          "
+                didSteps = False
+                spec = test.getTestProcedure()
+                # TODO: Code largely duplicated in sphinx.py.
+                prefixLens = [0] * 30
+                steps = []
+                for n, block in spec.walkSteps():
+                    num = testspec.formatStepNumber(n)
+                    steps.append((list(n), block, num))
+                    idx = len(n)
+                    prefixLens[idx] = max(len(num), prefixLens[idx])
+
+                for n, block, num in steps:
+                    nn = len(n)
+                    a, b = prefixLens[nn - 1:nn + 1]
+                    b -= a
+                    if n[-1] == 0:
+                        if n[0] == 0:
+                            sNormal.write("\n%-*sSetup\n" % (a, "1. "))
+                            n[0] += 1
+                            num = testspec.formatStepNumber(n)
+                    sNormal.write("\n")
+
+                    hangStr = "%*s%-*s" % (a, "", b, num)
+                    for line in addHang(block, hangStr):
+                        sNormal.write("%s\n" % line)
+
+                if didSteps:
+                    sNormal.write("\n")
+
+                sEmph.write("%s      Path:     %s\n" % (self.pad, test.path))
+                if test.klass:
+                    sEmph.write("%s      Class:    %s\n" % (
+                        self.pad, test.klass))
+                sEmph.write("%s      Function: %s\n" % (
+                    self.pad, test.funcName))
                 sNormal.write("\n")
 
-            sEmph.write("%s      Path:     %s\n" % (self.pad, test.path))
-            if test.klass:
-                sEmph.write("%s      Class:    %s\n" % (self.pad, test.klass))
-            sEmph.write("%s      Function: %s\n" % (self.pad, test.funcName))
-            sNormal.write("\n")
+            elif self.mode == "IDS-SUMMARY":
+                dotLen = self._announceItem(number=number,
+                        summary=test.summary, testID=test.testID, wrap=False,
+                        prefix="  # ")
+                sNormal.write("  %s        %s,\n" % (self.pad, test.uid))
 
-        elif self.mode == "IDS-SUMMARY":
-            dotLen = self._announceItem(number=number, summary=test.summary,
-                    testID=test.testID, wrap=False, prefix="  # ")
-            sNormal.write("  %s        %s,\n" % (self.pad, test.uid))
-
-        elif result is not None:
-            self._announceItemResult(summary=test.summary, result=result,
-                    number=number, testID=test.testID)
+            elif result is not None:
+                self._announceItemResult(summary=test.summary, result=result,
+                        number=number, testID=test.testID)
 
-        else:
-            self.currTest = test, number
-            stream = sNormal
-            if number > 0:
-                timeStr = getattr(test, "execTime", "")
-                dotLen = self._announceItem(number=number, summary=test.summary,
-                        testID=test.testID, term="", timeStr=timeStr)
-                self.annLine = sNormal.terminal.lineCount
-                if self.mode not in ("RUN-SUMMARY", "SUMMARY", "DETAILS",
-                            "xIDS-SUMMARY"):
-                    stream.write("." * dotLen)
-                    if eol:
-                        stream.terminal.nl()
-                else:
-                    stream.write("\n")
+            else:
+                self.currTest = test, number
+                stream = sNormal
+                if number > 0:
+                    timeStr = getattr(test, "execTime", "")
+                    dotLen = self._announceItem(number=number,
+                            summary=test.summary, testID=test.testID, term="",
+                            timeStr=timeStr)
+                    self.annLine = sNormal.terminal.lineCount
+                    if self.mode not in _NO_DOTS_MODES:
+                        stream.write("." * dotLen)
+                        if eol:
+                            stream.terminal.nl()
+                    else:
+                        stream.write("\n")
+        finally:
+            self.status.update()
 
-    @_ifNotNullTest
-    @_messesStatus
-    @_execOnly
     def putResult(self, test, itemType=None):
-        stream = sNormal
-        stream.terminal.flush()
-        if stream.terminal.column > 0:
-            stream.terminal.nl()
-        annLine = stream.terminal.lineCount
-        if annLine - self.annLine >= 10:
-            self.announceTestStart(*self.currTest, eol=False)
-        stream.terminal.sol()
-        stream.terminal.up(annLine - self.annLine)
-        stream.terminal.right(self.rightPos)
-        state = test.result.reportCode
-        if test.number > 0:
-            stateWriter[state].write("%12s\n" % state.altName)
-        stream.terminal.nl(annLine - self.annLine - 1)
+        if test.amNull or self.mode not in _EXEC_MODES:
+            return
+        self.status.kill()
+        try:
+            stream = sNormal
+            stream.terminal.flush()
+            if stream.terminal.column > 0:
+                stream.terminal.nl()
+            annLine = stream.terminal.lineCount
+            if annLine - self.annLine >= 10:
+                self.announceTestStart(*self.currTest, eol=False)
+            stream.terminal.sol()
+            stream.terminal.up(annLine - self.annLine)
+            stream.terminal.right(self.rightPos)
+            state = test.result.reportCode
+            if test.number > 0:
+                stateWriter[state].write("%12s\n" % state.altName)
+            stream.terminal.nl(annLine - self.annLine - 1)
+        finally:
+            self.status.update()
 
     def logStage(self, test, op, msg):
         if options.quiet:
@@ -937,25 +1028,22 @@ class Screen(FileLikeReporter):
         from cleversheep3.Test import Tester
         if options.quiet:
             return
-        stack = exc.stack
-        ll = ["%s%s" % (self.ind, l) for l in str(exc).splitlines()]
+        stack = Errors.normaliseStack(exc.stack)
+        ll = [f"{self.ind}{l}" for l in str(exc).splitlines()]
         sFailDetail.write("%s\n" % ("\n".join(ll)))
         root = Tester.execDir
-        for i, x in enumerate(stack):
-            try:
-                path, lnum, funcName, context, lineIdx, meta = x
-            except ValueError:
-                path, lnum, funcName, context, lineIdx = x
-                meta = ()
+        last = len(stack) - 1
+        for i, frame in enumerate(stack):
+            path, lnum, funcName, context, lineIdx, meta = frame
             if meta:
                 continue
             if not os.path.isabs(path):
-                path = os.path.join(stack.excDir, path)
-            sFile.write("%s%s" % (self.ind, Files.relName(path, root)))
+                path = os.path.join(exc.stack.excDir, path)
+            sFile.write(f"{self.ind}{Files.relName(path, root)}")
             sNormal.write(": ")
             sFunc.write("%s\n" % funcName)
             self._logStackFrame(path, lnum, funcName, context, lineIdx, meta,
-                    showContext=(i == 0) or (i == len(stack) - 1))
+                    showContext=(i == 0) or (i == last))
 
         # When using the RPC module, the original exception may have the
         # remote-end traceback attached as ``_rpcTraceBack``. If so, now is the
@@ -970,25 +1058,21 @@ class Screen(FileLikeReporter):
             showContext=False):
         if not showContext or not context:
             if not context:
-                sCode.write("%s   %-4d: <no context>\n" % (self.ind, lnum,))
+                sCode.write(f"{self.ind}   {lnum:<4d}: <no context>\n")
             else:
                 l = context[lineIdx].rstrip()
-                if l.strip():
-                    sCode.write("%s   %-4d: %s\n" % (self.ind, lnum, l))
+                if l:
+                    sCode.write(f"{self.ind}   {lnum:<4d}: {l}\n")
                 else:
-                    sCode.write("%s   %-4d:\n" % (self.ind, lnum, ))
+                    sCode.write(f"{self.ind}   {lnum:<4d}:\n")
             return
 
-        for i, line in enumerate(context):
-            ci = i + lnum - lineIdx
-            l = line.rstrip()
-            if i == lineIdx:
-                sEmphCode.write("%s==>%-4d: %s\n" % (self.ind, ci, l))
-            else:
-                if l.strip():
-                    sCode.write("%s   %-4d: %s\n" % (self.ind, ci, line.rstrip()))
-                else: #pragma: unreachable
-                    sCode.write("%s   %-4d:\n" % (self.ind, ci, ))
+        lines = _formatContext(self.ind, lnum, context, lineIdx)
+        if lineIdx:
+            sCode.write("\n".join(lines[:lineIdx]) + "\n")
+        sEmphCode.write(lines[lineIdx] + "\n")
+        if lineIdx + 1 < len(lines):
+            sCode.write("\n".join(lines[lineIdx + 1:]) + "\n")
 
 
 logger = LogReporter()
@@ -6,6 +6,7 @@ This is my take on how a test framework should be.
 __docformat__ = "restructuredtext"
 
 import os
+import weakref
 from io import StringIO
 
 
@@ -17,19 +18,62 @@ execDir = os.getcwd()
 # terminal output and redirection works in a consistent fashion.
 from cleversheep3.Test.Tester import Tty
 
+def _cacheMethod(proxy, name, attr):
+    """Store a provider's method directly on a proxy.
+
+    Later lookups of the name then find the method as a normal instance
+    attribute, without going through the proxy's ``__getattr__``. Only
+    methods are stored; other attributes may change and are always fetched
+    from the provider.
+
+    """
+    if callable(attr):
+        proxy.__dict__[name] = attr
+        proxy._cachedNames.append(name)
+    return attr
+
+
+def _clearMethods(proxy):
+    for name in proxy._cachedNames:
+        proxy.__dict__.pop(name, None)
+    del proxy._cachedNames[:]
+
+
+#: The proxies that cache service providers. These are invalidated, by a
+#: single registration callback, whenever a provider is registered. Weak
+#: references are held so that unused proxies can still be freed.
+_cachingProxies = weakref.WeakSet()
+
+
+def _invalidateProxies():
+    for proxy in list(_cachingProxies):
+        proxy._invalidate()
+
+
 class _Log:
     _log = None
+    def __init__(self):
+        self._cachedNames = []
+        _cachingProxies.add(self)
+
+    def _invalidate(self):
+        self._log = None
+        _clearMethods(self)
+
     @property
     def log(self):
-        return Coordinator.getServiceProvider("report_manager")
+        if self._log is None:
+            self._log = Coordinator.getServiceProvider("report_manager")
+        return self._log
 
     def __getattr__(self, name):
-        return getattr(self.log, name)
+        return _cacheMethod(self, name, getattr(self.log, name))
 
 
 # Now import the Coordinator. Later imports will register with it as service
 # providers.
 from cleversheep3.Test.Tester import Coordinator
+Coordinator.addRegistrationCallback(_invalidateProxies)
 
 
 #: The test framework log.
@@ -134,9 +178,8 @@ def currentTest():
         The currently executing `Test` instance or ``None``.
 
     """
-    manager = Coordinator.getServiceProvider("manager")
     try:
-        test = manager.executingTest
+        test = _manager.executingTest
     except (AttributeError, NameError):
         test = None
     return test
@@ -154,8 +197,7 @@ def setCommentary(s):
         The text to display. This will be truncated as necessary.
 
     """
-    manager = Coordinator.getServiceProvider("manager")
-    manager.setField("commentary", s)
+    _manager.setField("commentary", s)
 
 
 def setDelayLeft(seconds):
@@ -168,8 +210,7 @@ def setDelayLeft(seconds):
         The number of seconds left.
 
     """
-    manager = Coordinator.getServiceProvider("manager")
-    manager.setDelayLeft(seconds)
+    _manager.setDelayLeft(seconds)
 
 
 # Expose certain sub-module functions and data members.
@@ -205,10 +246,20 @@ def setLogPath(path):
 class ServiceProxy:
     def __init__(self, service):
         self._service = service
+        self._provider = None
+        self._cachedNames = []
+        _cachingProxies.add(self)
+
+    def _invalidate(self):
+        self._provider = None
+        _clearMethods(self)
 
     def __getattr__(self, name):
-        obj = Coordinator.getServiceProvider(self._service)
-        return getattr(obj, name)
+        obj = self._provider
+        if obj is None:
+            obj = self._provider = Coordinator.getServiceProvider(
+                self._service)
+        return _cacheMethod(self, name, getattr(obj, name))
 
 
 #: Provides access to the console where the test runner shows test
@@ -220,6 +271,9 @@ class ServiceProxy:
 #: it is recommended that you use ``console.write(...)``.
 console = ServiceProxy("status")
 
+# The test manager, used by `currentTest`, `setCommentary`, etc.
+_manager = ServiceProxy("manager")
+
 # TODO: This nolonger exists!
 # executeTest = public(Execution.executeTest)
 
@@ -267,6 +321,10 @@ registerOnTestEnd = public(Execution.add_testRunEndCallback)
 # Preferred names start here.
 addExitCallback = public(Execution.add_test_exit_callback)
 
+def _alwaysApplicable(self, t):
+    return True
+
+
 class TestMarker:
     """A decorator maker, used to mark test functions.
 
@@ -280,13 +338,13 @@ class TestMarker:
     def _mark(self, f, args=(), kwargs={}):
         kwargs["_test_seq"] = self.seq
         f.cs_test_info = Core.TestInfo(*args, **kwargs)
-        f.cs_is_applicable = kwargs.pop("cs_is_applicable", lambda self, t: True)
+        f.cs_is_applicable = kwargs.pop("cs_is_applicable", _alwaysApplicable)
         try:
-            f.cs_test_info.cs_tags["cs_modPath"] = os.path.abspath(
+            f.cs_test_info.cs_tags["cs_modPath"] = Collection.cwdNormPath(
                 f.__globals__["__file__"])
         except AttributeError:
             # The function may be a callable class instance.
-            f.cs_test_info.cs_tags["cs_modPath"] = os.path.abspath(
+            f.cs_test_info.cs_tags["cs_modPath"] = Collection.cwdNormPath(
                 f.__call__.__globals__["__file__"])
         self.seq += 1
         return f
@@ -350,23 +408,14 @@ def getTrace():
 #                         Tests and suites.
 # ============================================================================
 
-import inspect
-
-# TODO: Duplicated in Aspects and ImpUtils
-def _getCallerDict(level=1):
-    frame = None
-    try:
-        frame = inspect.stack()[level + 1][0]
-        return frame.f_globals
-    finally:
-        del frame
+from cleversheep3.utils import _getCallerDict
 
 
-def _setExecDir(namespace):
+def _setExecDir(dirPath):
     global execDir
 
     if execDir is None:
-        execDir = os.path.dirname(os.path.abspath(namespace.get("__file__")))
+        execDir = dirPath
 
 
 def runTree():
@@ -393,12 +442,16 @@ def runTree():
     sys.exit(exitCode)
 
 
+#: Marks that no default was supplied to `Info.get`.
+_missing = object()
+
+
 class Info:
     def __init__(self):
         self.namespace = namespace = _getCallerDict(2)
         self.execFile = os.path.abspath(namespace["__file__"])
         self.execDir = os.path.dirname(self.execFile)
-        _setExecDir(self)
+        _setExecDir(self.execDir)
 
     def __getitem__(self, name):
         return self.namespace[name]
@@ -409,13 +462,10 @@ class Info:
     def __iter__(self):
         return iter(self.namespace)
 
-    def get(self, name, default=__getitem__):
-        try:
+    def get(self, name, default=_missing):
+        if default is _missing:
             return self.namespace[name]
-        except KeyError:
-            if default is Info.__getitem__:
-                raise
-        return default
+        return self.namespace.get(name, default)
 
 
 def runModule():
@@ -39,6 +39,16 @@ class TrimmedFile:
         self.f = open(self.path, mode)
 
     def write(self, s):
+        if self.buf is not None and "\n" not in s[:-1]:
+            # The common case of a single, possibly partial, line.
+            if s:
+                if self.partialLine and self.buf:
+                    self.buf[-1] += s
+                else:
+                    self.buf.append(s)
+            self.partialLine = not s.endswith("\n")
+            return
+
         lines = s.splitlines(True)
         if self.buf is None:
             while lines and not lines[0].strip():
@@ -60,14 +70,16 @@ class TrimmedFile:
             return
 
         # Keep any trailing blank and partial lines.
-        keep = []
-        if self.buf and self.partialLine:
-            keep.append(self.buf.pop())
-        while self.buf and not self.buf[-1].strip():
-            keep.append(self.buf.pop())
-        self.f.write("".join(self.buf))
-        self.f.flush()
-        self.buf = list(reversed(keep))
+        buf = self.buf
+        idx = len(buf)
+        if idx and self.partialLine:
+            idx -= 1
+        while idx and not buf[idx - 1].strip():
+            idx -= 1
+        if idx:
+            self.f.write("".join(buf[:idx]))
+            self.f.flush()
+        self.buf = buf[idx:]
 
     def close(self):
         self.flush()
@@ -91,12 +103,9 @@ class SphinxNode:
 
 
 def commSubPath(a, b):
-    aa = a.split(os.path.sep)
     bb = b.split(os.path.sep)
-    while aa and bb and aa[0] == bb[0]:
-        aa.pop(0)
-        bb.pop(0)
-    return os.path.sep.join(bb)
+    common = os.path.commonprefix([a.split(os.path.sep), bb])
+    return os.path.sep.join(bb[len(common):])
 
 
 class SphinxSuite(SphinxNode):
@@ -110,11 +119,19 @@ class SphinxSuite(SphinxNode):
         self.lev = lev
         self.uid = suite.uid
         self.suitePath = path
+        self.path = path.replace(".pyc", "").replace(".py", "") + ".rst"
+        if not os.path.isabs(options.sphinx):
+            self._outPath = os.path.join(execDir, options.sphinx, self.path)
+        else:
+            self._outPath = os.path.join(options.sphinx, self.path)
         self.suite = suite
         self.parent = parent
         self.toc = []
         if klass is None:
             self.parent.addToc(self)
+            self._relLevel = 0
+        else:
+            self._relLevel = 1 + parent.relLevel()
 
         self.contents = []
         self.contents.append("%s" % suite.summary)
@@ -125,7 +142,9 @@ class SphinxSuite(SphinxNode):
         self.contents.append("")
         if klass:
             self.title = klass
+            heading = klass
         else:
+            heading = path.replace(".py", "").replace(".pyc", "")
             if path.endswith("all_tests.py"):
                 path = os.path.basename(path)
             path = path.replace(".py", "")
@@ -133,14 +152,14 @@ class SphinxSuite(SphinxNode):
             self.title = path
         self.label = None
 
+        # The heading used when writing the document.
+        self.heading = f"Suite: {heading}"
+        self.uLine = ulChars[self._relLevel] * len(self.heading)
+
     def addToc(self, suite):
         #print "ADD TOC", self.path, suite.path
         self.toc.append(commSubPath(self.path, suite.path))
 
-    @property
-    def path(self):
-        return self.suitePath.replace(".pyc", "").replace(".py", "") + ".rst"
-
     def addSubSuites(self, suites, rootDir):
         if not suites:
             return []
@@ -165,10 +184,7 @@ class SphinxSuite(SphinxNode):
 
     def generate(self):
         pathParts, klass, _ = self.suite.uid
-        if not os.path.isabs(options.sphinx):
-            path = os.path.join(execDir, options.sphinx, self.path)
-        else:
-            path = os.path.join(options.sphinx, self.path)
+        path = self._outPath
         if klass is None:
             Files.mkParentDir(path)
             f = TrimmedFile(path, "w")
@@ -184,49 +200,35 @@ class SphinxSuite(SphinxNode):
             suite.generate()
 
     def relLevel(self):
-        pathParts, klass, _ = self.suite.uid
-        if klass is None:
-            return 0
-        return 1 + self.parent.relLevel()
+        return self._relLevel
 
     def write(self, f):
         suite = self.suite
-        pathParts, klass, _ = suite.uid
-        lev = self.relLevel()
-        ulc = ulChars[lev]
+        uLine = self.uLine
 
         # Write out the suite class/path for the title
-        if klass:
-            title = klass
-        else:
-            path = self.suitePath
-            #if path.endswith("all_tests.py"):
-            #    path = os.path.basename(path)
-            path = path.replace(".py", "")
-            path = path.replace(".pyc", "")
-            title = path
-        title = "Suite: %s" % (title, )
-        uLine = ulc * len(title)
-        if lev == 0:
-            f.write("%s\n" % uLine)
-        f.write("%s\n" % title)
-        f.write("%s\n\n" % uLine)
+        parts = []
+        if self._relLevel == 0:
+            parts.append(f"{uLine}\n")
+        parts.append(f"{self.heading}\n")
+        parts.append(f"{uLine}\n\n")
 
         # Add TOC for child files.
         toc = self.toc
         if toc:
-            f.write(".. toctree::\n")
-            f.write("   :maxdepth: 2\n\n")
+            parts.append(".. toctree::\n")
+            parts.append("   :maxdepth: 2\n\n")
             for line in toc:
-                f.write("   %s\n" % line)
-            f.write("\n\n")
+                parts.append(f"   {line}\n")
+            parts.append("\n\n")
 
-        f.write("%s\n" % suite.summary)
+        parts.append(f"{suite.summary}\n")
         if suite.details:
-            f.write("\n")
+            parts.append("\n")
             for line in suite.details:
-                f.write("%s\n" % line)
-        f.write("\n")
+                parts.append(f"{line}\n")
+        parts.append("\n")
+        f.write("".join(parts))
 
     def addTest(self, test):
         self.tests.append(SphinxTest(test, self))
@@ -236,66 +238,78 @@ class SphinxTest:
     def __init__(self, test, parent):
         self.test = test
         self.parent = parent
-
-    def write(self, f):
-        test = self.test
         path, klass, func = test.uid
         title = test.testID
         if title is None:
             title = func
-        title = "Test: %s" % title
-        lev = 1 + self.parent.relLevel()
-        ulc = ulChars[lev]
-        uLine = ulc * len(title)
-        f.write("\n%s\n" % title)
-        f.write("%s\n\n" % uLine)
-        f.write("%s\n\n" % test.summary)
+        self.heading = f"Test: {title}"
+        self.uLine = ulChars[1 + parent.relLevel()] * len(self.heading)
+
+    def write(self, f):
+        test = self.test
+        parts = []
+        parts.append(f"\n{self.heading}\n")
+        parts.append(f"{self.uLine}\n\n")
+        parts.append(f"{test.summary}\n\n")
         for line in test.details:
-            f.write("%s\n" % line)
-        #f.write("\n")
+            parts.append(f"{line}\n")
 
         if test.testID is not None:
-            f.write(".. <desc-end:%s>\n" % test.testID)
-            f.write("\n")
+            parts.append(f".. <desc-end:{test.testID}>\n")
+            parts.append("\n")
 
         heading = ".. rubric:: Procedure"
         spec = test.getTestProcedure()
+        # The walk reuses its step number list, so take a copy of each one.
+        steps = [(list(n), block) for n, block in spec.walkSteps()]
         prefixLens = [0] * 30
-        for n, block in spec.walkSteps():
-            num = ".".join("%d" % v for v in n) + ". "
+        for n, block in steps:
             idx = len(n)
-            prefixLens[idx] = max(len(num), prefixLens[idx])
-
-        for n, block in spec.walkSteps():
+            numLen = sum(len(str(v)) for v in n) + idx + 1
+            prefixLens[idx] = max(numLen, prefixLens[idx])
+
+        # Once a setup step has been numbered, later top level numbers move
+        # up by one.
+        bump = 0
+        for n, block in steps:
+            n[0] += bump
             nn = len(n)
             a, b = prefixLens[nn - 1:nn + 1]
             b -= a
             if heading:
-                f.write("%s\n" % heading)
+                parts.append(f"{heading}\n")
                 heading = None
                 if n[0] == 0:
-                    f.write("\n%-*sSetup\n" % (a, "1. "))
+                    parts.append("\n%-*sSetup\n" % (a, "1. "))
                     n[0] += 1
-            f.write("\n")
+                    bump = 1
+            parts.append("\n")
 
-            num = ".".join("%d" % v for v in n) + ". "
+            num = ".".join(map(str, n)) + ". "
             hangStr = "%*s%-*s" % (a, "", b, num)
             for line in addHang(block, hangStr):
-                f.write("%s\n" % line)
+                parts.append(f"{line}\n")
         if heading is None:
-            f.write("\n")
+            parts.append("\n")
+        f.write("".join(parts))
+
+
+#: Padding strings used by `addHang`, keyed by length.
+_padCache = {}
 
 
 # TODO: Also in Manager.py and TermDisplay.py
 def addHang(lines, hangText):
-    res = []
-    pad = " " * len(hangText)
-    for i, line in enumerate(lines):
-        if i:
-            res.append(pad + line)
-        else:
-            res.append(hangText + line)
-    return res
+    n = len(hangText)
+    pad = _padCache.get(n)
+    if pad is None:
+        pad = _padCache[n] = " " * n
+    it = iter(lines)
+    for line in it:
+        yield hangText + line
+        break
+    for line in it:
+        yield pad + line
 
 
 class SphinxDoc:
@@ -343,16 +357,15 @@ class SphinxDoc:
             title = "Test specification"
             ulc = ulChars[0]
             uLine = ulc * len(title)
-            f.write("%s\n" % uLine)
-            f.write("%s\n" % title)
-            f.write("%s\n\n" % uLine)
+            parts = ["%s\n" % uLine, "%s\n" % title, "%s\n\n" % uLine]
             toc = self.toc
             if toc:
-                f.write(".. toctree::\n")
-                f.write("   :maxdepth: 2\n\n")
+                parts.append(".. toctree::\n")
+                parts.append("   :maxdepth: 2\n\n")
                 for line in toc:
-                    f.write("   %s\n" % line)
-                f.write("\n\n")
+                    parts.append("   %s\n" % line)
+                parts.append("\n\n")
+            f.write("".join(parts))
 
         for suite in self.children:
             suite.generate()
@@ -6,10 +6,15 @@ import sys
 from cleversheep3.Test.Tester import Coordinator
 from cleversheep3.Test.Tester import log
 
-rProcCall = re.compile(r' *(?P<name>[a-zA-Z0-9_.]+)\(')
-rFuncCall = re.compile(r'[^=]*= *(?P<name>[a-zA-Z0-9_.]+)\(')
-rStepComment = re.compile(r'^ *#> (.*)')
-rComment = re.compile(r'^ *#(.*)')
+# Classifies a source line as a step comment, other comment, procedure call
+# or function call. The alternatives are tried in that order and the name of
+# the matching group (``m.lastgroup``) identifies which one matched.
+rLine = re.compile(r'''^(?:
+      \ *\#>\ (?P<step>.*)
+    | \ *\#(?P<comment>.*)
+    | \ *(?P<proc>[a-zA-Z0-9_.]+)\(
+    | [^=]*=\ *(?P<func>[a-zA-Z0-9_.]+)\(
+)''', re.VERBOSE)
 
 
 #{ Public
@@ -17,8 +22,12 @@ class TestSpecDB:
     def __init__(self):
         self._callMap = {}
         self._stepMap = {}
+        self._codeStepLines = {}
 
     def gatherTestSteps(self, func):
+        # Make sure the source is current once, rather than for every
+        # function that gets mapped.
+        linecache.checkcache()
         f = TestMap.getTestMap(func)
         #self.dump(f)
         self.getMap(f)
@@ -37,6 +46,15 @@ class TestSpecDB:
         self._callMap.update(callMap)
         self._stepMap.update(stepMap)
 
+        # Index the step line numbers by code object, so that the tracer
+        # can reject most line events without building a step key.
+        newLines = {}
+        for code, lineNum in stepMap:
+            newLines.setdefault(code, set()).add(lineNum)
+        codeStepLines = self._codeStepLines
+        for code, lines in newLines.items():
+            codeStepLines[code] = codeStepLines.get(code, frozenset()) | lines
+
     def dump(self, func):
         for level, p in func.walk():
             pad = "  " * level
@@ -46,7 +64,8 @@ class TestSpecDB:
                     print("%s%s" % (pad, line))
 
     def runAndTrace(self, func, *args, **kwargs):
-        runTracer = RunTracer(self._callMap, self._stepMap)
+        runTracer = RunTracer(self._callMap, self._stepMap,
+                              self._codeStepLines)
         runTracer.run(func, args, kwargs)
 #}
 
@@ -78,6 +97,17 @@ def isMethodOrFunc(obj):
     return inspect.isfunction(obj) or inspect.ismethod(obj)
 
 
+def formatStepNumber(n):
+    """Format a step number sequence, as yielded by `TestMap.walkSteps`.
+
+    For example ``[2, 1]`` becomes ``"2.1. "``.
+
+    """
+    if len(n) == 1:
+        return "%d. " % n[0]
+    return ".".join(["%d" % v for v in n]) + ". "
+
+
 def unwrapFunc(func):
     while hasattr(func, "undecorated"):
         func = func.undecorated
@@ -99,15 +129,18 @@ class TestMap(PointOfInterest):
         NOT SURE YET.
       steps
         The detailed steps extracted from the source code.
+      _ordered
+        The invocations and steps, in source order. This is set up by
+        `getStepsAndCalls`, after which neither list changes.
 
     """
     sortV = 100
     type = "func"
     _known = {}
     _classMap = {}
+    _resolveCache = {}
 
     def __init__(self, func):
-        linecache.checkcache()
         self.func = func
         self.code = func.__code__
         try:
@@ -118,6 +151,7 @@ class TestMap(PointOfInterest):
             self.lines = []
         self.invocations = []
         self.steps = []
+        self._ordered = []
 
     @property
     def levelAdjust(self):
@@ -125,31 +159,51 @@ class TestMap(PointOfInterest):
             return -1
         return 0
 
-    def processInvocation(self, lineIdx, line, emitStep, module, klass):
-        m = rProcCall.match(line) or rFuncCall.match(line)
-        if m:
-            emitStep()
-            invokeName = m.group("name")
-            if invokeName.startswith("self."):
-                invokeName = invokeName[5:]
-            calledFunc = getattr(module, invokeName, None)
-            if calledFunc is None and klass is not None:
-                calledFunc = klass.__dict__.get(invokeName, None)
-                if calledFunc is None:
-                    for base in klass.__bases__:
-                        calledFunc = getattr(base, invokeName, None)
-                        if calledFunc is not None:
-                            break
-            if calledFunc is None:
-                return True
-            self._classMap[calledFunc] = klass
-            if not (isMethodOrFunc(calledFunc)
-                    or hasattr(calledFunc, "_cs_isProcedural")):
-                return True
-
-            calledFunc = self.getTestMap(calledFunc)
-            self.invocations.append((self.startLine + lineIdx, calledFunc))
-            return True
+    def processInvocation(self, lineIdx, invokeName, emitStep, module, klass):
+        emitStep()
+        if invokeName.startswith("self."):
+            invokeName = invokeName[5:]
+        calledFunc = self.resolveName(invokeName, module, klass)
+        if calledFunc is None:
+            return
+        self._classMap[calledFunc] = klass
+        if not (isMethodOrFunc(calledFunc)
+                or hasattr(calledFunc, "_cs_isProcedural")):
+            return
+
+        calledFunc = self.getTestMap(calledFunc)
+        self.invocations.append((self.startLine + lineIdx, calledFunc))
+
+    @classmethod
+    def resolveName(cls, name, module, klass):
+        """Find the object that a name, invoked from a test function, refers to.
+
+        The module's namespace is searched first, then the class and its
+        bases. The results are cached, per module and class, because the
+        same names tend to be invoked from many sibling test functions.
+
+        :Return:
+            The object or ``None`` if the name could not be resolved.
+
+        """
+        names = cls._resolveCache.get((module, klass))
+        if names is None:
+            names = cls._resolveCache[module, klass] = {}
+        try:
+            return names[name]
+        except KeyError:
+            pass
+
+        obj = getattr(module, name, None)
+        if obj is None and klass is not None:
+            obj = klass.__dict__.get(name, None)
+            if obj is None:
+                for base in klass.__bases__:
+                    obj = getattr(base, name, None)
+                    if obj is not None:
+                        break
+        names[name] = obj
+        return obj
 
     def getStepsAndCalls(self):
         """Find all test steps and function invocations for this function.
@@ -170,15 +224,14 @@ class TestMap(PointOfInterest):
         if klass is None:
             klass = self._classMap.get(self.func, None)
         for lineIdx, line in enumerate(self.lines):
-            m = rStepComment.match(line)
+            m = rLine.match(line)
             if m:
-                step.append(m.group(1))
-                continue
-
-            if rComment.match(line):
-                continue
-
-            if self.processInvocation(lineIdx, line, emitStep, module, klass):
+                kind = m.lastgroup
+                if kind == "step":
+                    step.append(m.group(kind))
+                elif kind != "comment":
+                    self.processInvocation(lineIdx, m.group(kind), emitStep,
+                                           module, klass)
                 continue
 
             if line.strip():
@@ -186,10 +239,11 @@ class TestMap(PointOfInterest):
             else:
                 step.append(line.rstrip())
         emitStep()
+        self._ordered = sorted(self.invocations + self.steps,
+                               key=lambda el: (el[0], el[1].sortV, el[1]))
 
     def walk(self, level=0, select=lambda l, c: True):
-        for i, p in sorted(self.invocations + self.steps,
-                           key=lambda el: (el[0], el[1].sortV, el[1])):
+        for i, p in self._ordered:
             if p is self:
                 continue
             if select(level, p):
@@ -201,41 +255,38 @@ class TestMap(PointOfInterest):
         n = []
         for level, p in self.walk():
             if p.type == "step":
-                while len(n) > level + 1:
-                    n.pop()
-                while len(n) <= level:
-                    n.append(0)
-                n[-1] += 1
-                pad = "  " * level
+                if level < len(n):
+                    del n[level + 1:]
+                    n[level] += 1
+                else:
+                    n.extend([0] * (level - len(n)))
+                    n.append(1)
                 yield n, p.lines
 
     @classmethod
     def getTestMap(cls, func):
-        if func not in cls._known:
-            funcMap = TestMap(func)
-            cls._known[func] = funcMap
+        funcMap = cls._known.get(func)
+        if funcMap is None:
+            funcMap = cls._known[func] = TestMap(func)
             funcMap.getStepsAndCalls()
-        return cls._known[func]
+        return funcMap
 
 
 class RunTracer:
-    def __init__(self, callMap, stepMap):
-        self.traceTable = {
-            "call": self.handleCall,
-            "line": self.handleLine,
-            "return": self.handleReturn,
-        }
+    def __init__(self, callMap, stepMap, codeStepLines):
         self.code = self.func = None
+        self.stepLines = ()
         self.stack = []
         self.n = []
         self._callMap = callMap
         self._stepMap = stepMap
         self._prevKey = None
+        self._codeStepLines = codeStepLines
 
     def run(self, func, args, kwargs):
         self.oldTrace = sys.gettrace()
         self.lineTrace = None
-        sys.settrace(self.trace)
+        sys.settrace(self.handleCall)
         _cs_preamble_ = None
         try:
             func(*args, **kwargs)
@@ -247,19 +298,28 @@ class RunTracer:
             return self.oldTrace(frame, event, arg)
 
     def trace(self, frame, event, arg):
-        return self.traceTable.get(event, self._fallback)(frame, event, arg)
+        """The local trace function for frames of mapped functions."""
+        if event == "line":
+            return self.handleLine(frame, event, arg)
+        if event == "return":
+            return self.handleReturn(frame, event, arg)
+        return self._fallback(frame, event, arg)
 
     def handleCall(self, frame, event, arg):
         lineTrace = None
         if self.oldTrace:
             lineTrace = self.oldTrace(frame, event, arg)
-        func = self._callMap.get(frame.f_code, None)
+        code = frame.f_code
+        func = self._callMap.get(code, None)
         if func is not None:
-            code = frame.f_code
-            self.stack.append((self.code, self.func, list(self.n),
-                               self.lineTrace))
+            self.stack.append((self.code, self.func, self.stepLines,
+                               list(self.n), self.lineTrace))
             self.lineTrace = lineTrace
-            self.code, self.func = code, self._callMap[code]
+            self.code, self.func = code, func
+            self.stepLines = self._codeStepLines.get(code, ())
+            if not (self.stepLines or lineTrace):
+                # Only the return event is of interest.
+                frame.f_trace_lines = False
             self.n.append(0)
             return self.trace
         return lineTrace
@@ -267,28 +327,25 @@ class RunTracer:
     def handleLine(self, frame, event, arg):
         if self.lineTrace:
             ret = self.lineTrace(frame, event, arg)
-        stepKey = self.code, frame.f_lineno
+        lineNum = frame.f_lineno
+        if lineNum not in self.stepLines:
+            return
+        stepKey = self.code, lineNum
         step = self._stepMap.get(stepKey, None)
         if step is not None:
             if stepKey == self._prevKey:
                 return
             self._prevKey = stepKey
             self.n[-1] += 1
-            ind = "  " * (len(self.stack) - 1)
-            nStr = ".".join(str(v) for v in self.n) + "."
+            nStr = ".".join(map(str, self.n)) + "."
             self.update_commentary([nStr] + step)
             return self.trace
-            for i, line in enumerate(step):
-                if i == 0:
-                    print()
-                print("%s%s %s" % (ind, nStr, line))
-                if i == 0:
-                    nStr = " " * len(nStr)
 
     def handleReturn(self, frame, event, arg):
         if self.lineTrace:
             self.lineTrace(frame, event, arg)
-        self.code, self.func, self.n, self.lineTrace = self.stack.pop()
+        (self.code, self.func, self.stepLines, self.n,
+                self.lineTrace) = self.stack.pop()
         return self.trace
 
     def update_commentary(self, lines):
@@ -11,10 +11,10 @@ Credits
 __docformat__ = "restructuredtext"
 
 
-coding = zip(
+coding = tuple(zip(
     [1000,900,500,400,100,90,50,40,10,9,5,4,1],
     ["M","CM","D","CD","C","XC","L","XL","X","IX","V","IV","I"]
-)
+))
 
 def decToRoman(num):
     """Convert a decimal number to Roman numeral form.
@@ -32,9 +32,10 @@ def decToRoman(num):
     """
     if num <= 0 or num >= 4000 or int(num) != num: #pragma: unreachable
         raise ValueError('Input should be an integer between 1 and 3999')
+    num = int(num)
     result = []
     for d, r in coding:
-        while num >= d:
-            result.append(r)
-            num -= d
+        q, num = divmod(num, d)
+        if q:
+            result.append(r * q)
     return ''.join(result)
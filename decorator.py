@@ -2,15 +2,17 @@
 __docformat__ = "restructuredtext"
 
 import os
+import sys
 import warnings
-import inspect
 
+# Find the first caller outside of the test framework.
 csPath = os.path.join("cleversheep3", "Test", "Tester")
-for count, frame in enumerate(inspect.stack()):
-    if count == 0:
-        continue
-    if csPath not in frame[1]:
-        break
+frame = sys._getframe(1)
+count = 1
+while csPath in frame.f_code.co_filename and frame.f_back is not None:
+    frame = frame.f_back
+    count += 1
+del frame
 
 warnings.warn("""
 The 'cleversheep3.decorator' module is deprecated. It will no longer be
@@ -1,9 +1,8 @@
 from cleversheep3.Prog import Aspects
 
-import functools
-import inspect
 import os
 import sys
+import traceback
 
 from cleversheep3.Prog import Files
 
@@ -15,17 +14,20 @@ class Partial:
     partial function is invoked
     """
     def __init__(self, func, *args, **kwargs):
-        self._partial = functools.partial(func, *args, **kwargs)
+        self._func = func
+        self._args = list(args)
+        self._kwargs = kwargs
 
     def update(self, *args, **kwargs):
-        args = self._partial.args + args
-        keywords = self._partial.keywords
-        keywords.update(kwargs)
-        self._partial = functools.partial(self._partial.func, *args,
-                                          **keywords)
+        self._args.extend(args)
+        self._kwargs.update(kwargs)
 
     def __call__(self, *args, **kwargs):
-        return self._partial(*args, **kwargs)
+        return self._func(*self._args, *args, **{**self._kwargs, **kwargs})
+
+
+#: Path component that identifies cleversheep3's own source files.
+_csMarker = os.sep + "cleversheep3" + os.sep
 
 
 class TrackerSet(set):
@@ -62,43 +64,35 @@ def dumpStack(level=1, incCS=False, f=None, exclude=()):
     The result is a lie, but normally more readily useful. It is only intended
     to be used for debugging.
     """
-    import traceback, os, sys
-    from io import StringIO
-
     cwd = os.path.dirname(os.path.dirname(__file__))
     stack = traceback.extract_stack()
     data = []
     maxLen = 0
-    s = StringIO()
     for filename, lineNumber, functionName, text in stack[:-level]:
-        if not incCS and "/cleversheep3/" in filename:
+        if not incCS and _csMarker in filename:
             continue
         if filename == "<string>":
             continue
-        skip = False
-        for candidate in exclude:
-            if candidate in filename:
-                skip = True
-                break
-        if skip:
+        if any(candidate in filename for candidate in exclude):
             continue
         location = "%s:%d %s" % (
             Files.relName(filename, cwd), lineNumber, functionName)
         data.append((location, text))
-        maxLen = max(len(location), maxLen)
+        if len(location) > maxLen:
+            maxLen = len(location)
 
-    s.write("Stack dump:\n")
-    for location, text in data:
-        s.write("    %-*s - %s\n" % (maxLen, location, text))
+    parts = ["Stack dump:\n"]
+    parts.extend("    %-*s - %s\n" % (maxLen, location, text)
+                 for location, text in data)
+    parts.append("\n")
 
     f = f or sys.stdout
-    f.write("%s\n" % s.getvalue())
+    f.write("".join(parts))
 
 
 def getCallerDict():
-    frame = None
+    frame = sys._getframe(2)
     try:
-        frame = inspect.stack()[2][0]
         return frame.f_globals
     finally:
         del frame
@@ -124,13 +118,15 @@ def trimLines(lines, stats=False):
         lines is returned.
     """
     lines = list(lines)
-    before, after = 0, 0
-    while lines and not lines[0].strip():
-        lines.pop(0)
-        before += 1
-    while lines and not lines[-1].strip():
-        lines.pop()
-        after += 1
+    n = len(lines)
+    i = 0
+    while i < n and not lines[i].strip():
+        i += 1
+    j = n
+    while j > i and not lines[j - 1].strip():
+        j -= 1
+    before, after = i, n - j
+    lines = lines[i:j]
     if stats:
         return lines, (before, after)
     return lines
@@ -172,18 +168,27 @@ class temporaryCWD(preserveCWD):
         os.chdir(self._targetDirectory)
 
 
+#: The loaded ``.cs-meta`` files, keyed by absolute path. A project's meta
+#: file is read at most once, however many projects depend on it.
+_metaCache = {}
+
+
 def loadCSMeta(dirPath='.'):
-    meta = {
-        'requires': (),
-    }
     metaPath = os.path.join(dirPath, '.cs-meta')
-    if os.path.exists(metaPath):
-        d = {}
-        with open(metaPath) as f:
-            code = compile(f.read(), metaPath, 'exec')
-            exec(code, d, )
-        meta.update(d)
-    return meta
+    key = os.path.abspath(metaPath)
+    meta = _metaCache.get(key)
+    if meta is None:
+        meta = {
+            'requires': (),
+        }
+        if os.path.exists(metaPath):
+            d = {}
+            with open(metaPath) as f:
+                code = compile(f.read(), metaPath, 'exec')
+                exec(code, d, )
+            meta.update(d)
+        _metaCache[key] = meta
+    return dict(meta)
 
 
 def addThisProjectSourceToSysPath():
@@ -219,7 +224,12 @@ def addProjectSourceToSysPath(projectName):
 
 
 def addDependenciesToSysPath(dirPath='.'):
-    loaded = set()
+    _addDependencies(dirPath, set())
+
+
+def _addDependencies(dirPath, loaded):
+    # The set of loaded projects is shared by the whole walk, so each
+    # project's dependencies are only added once.
     meta = loadCSMeta(dirPath)
     loaded.add(os.path.abspath(dirPath))
     for required in meta['requires']:
@@ -227,7 +237,7 @@ def addDependenciesToSysPath(dirPath='.'):
         projDir = _getProjectDir(required)
         if projDir not in loaded:
             loaded.add(projDir)
-            addDependenciesToSysPath(projDir)
+            _addDependencies(projDir, loaded)
 
 
 def findFileAbove(filename):
@@ -247,18 +257,20 @@ def findFileAbove(filename):
         The absolute path of the root directory or None if it could not be
         found.
     """
-    workDir = ""
+    workDir = os.getcwd()
     for i in range(20):
         path = os.path.join(workDir, filename)
         if os.path.exists(path):
-            return os.path.abspath(path)
-        workDir = os.path.join(workDir, "..")
+            return path
+        parent = os.path.dirname(workDir)
+        if parent == workDir:
+            return None
+        workDir = parent
 
 
 def _getCallerDict(level=2):
-    frame = None
+    frame = sys._getframe(level + 1)
     try:
-        frame = inspect.stack()[level + 1][0]
         return frame.f_globals
     finally:
         del frame